@@ -2,21 +2,183 @@ import subprocess
 import os
 import sys
 import re
+import time
+import uuid
+import queue
 import shlex
+import hashlib
 import atexit
 import logging
+import signal
+import asyncio
+import weakref
+import threading
+from contextlib import suppress, contextmanager
+from config import CODEPATH, Config
 
-if sys.platform == 'win32':
-    from utils import placebo as timeout
 
-else:
-    from wrapt_timeout_decorator import timeout
+def group_opt():
+    if sys.platform == 'win32':
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
 
-from config import CODEPATH
+    return {'start_new_session': True}
+
+
+def kill_tree(pid, startupinfo=None):
+    if sys.platform == 'win32':
+        subprocess.run(
+            ['taskkill', '/F', '/T', '/PID', str(pid)],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            startupinfo=startupinfo
+        )
+
+    else:
+        with suppress(ProcessLookupError, PermissionError):
+            os.killpg(pid, signal.SIGKILL)
+
+
+def kill_group(process, startupinfo=None):
+    if process.poll() is not None:
+        return
+
+    kill_tree(process.pid, startupinfo)
+
+    with suppress(ProcessLookupError):
+        process.kill()
+
+
+class ShellSession:
+    START_TIMEOUT = 10
+    READ_SIZE = 2**16
+
+    def __init__(self, adb_cmd, su=False, startupinfo=None, **kwargs):
+        self.adb_cmd = adb_cmd
+        self.su = su
+        self.startupinfo = startupinfo
+        self.logger = kwargs.get('logger', logging.getLogger(__name__))
+        self.process = None
+        self.chunks = None
+        self.pending = b''
+        self.lock = threading.Lock()
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        self.close()
+
+        cmd = [*self.adb_cmd, 'shell', '-T', *(['su'] if self.su else [])]
+
+        self.logger.debug(f'Shell session: {cmd}')
+
+        self.process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            startupinfo=self.startupinfo,
+            **group_opt()
+        )
+        self.chunks = queue.Queue()
+        self.pending = b''
+
+        threading.Thread(target=self._reader, args=(self.process.stdout, self.chunks), daemon=True).start()
+
+        try:
+            output, code = self._run('echo ready', self.START_TIMEOUT)
+        except TimeoutError:
+            raise ShellSessionError('Shell session did not respond.')
+
+        if code != 0 or output.strip() != b'ready':
+            raise ShellSessionError('Shell session handshake failed.')
+
+    def _reader(self, stream, chunks):
+        for chunk in iter(lambda: stream.read1(self.READ_SIZE), b''):
+            chunks.put(chunk)
+
+        chunks.put(b'')
+
+    def _run(self, cmd, timeout=None):
+        marker = uuid.uuid4().hex
+
+        self.process.stdin.write(f'{{ {cmd}\n}} </dev/null 2>/dev/null\nprintf "\\n{marker} %d\\n" $?\n'.encode())
+        self.process.stdin.flush()
+
+        rex = re.compile(rb'\n' + marker.encode() + rb' (\d+)\n')
+
+        buff = bytearray(self.pending)
+        searched = 0
+        deadline = time.monotonic() + timeout if timeout else None
+
+        while True:
+            match = rex.search(buff, max(0, searched - len(marker) - 16))
+
+            if match:
+                self.pending = bytes(buff[match.end():])
+
+                return bytes(buff[:match.start()]), int(match.group(1))
+
+            searched = len(buff)
+
+            try:
+                chunk = self.chunks.get(timeout=max(0, deadline - time.monotonic()) if deadline else None)
+            except queue.Empty:
+                raise TimeoutError(f'Shell command timed out: {cmd}')
+
+            if not chunk:
+                raise ShellSessionError('Shell session closed.')
+
+            buff += chunk
+
+    def run(self, cmd, timeout=None):
+        with self.lock:
+            for attempt in range(2):
+                try:
+                    if not self.alive:
+                        self.start()
+
+                    return self._run(cmd, timeout)
+
+                except TimeoutError:
+                    self.close()
+
+                    raise
+
+                except (OSError, ShellSessionError) as e:
+                    self.logger.debug(f'Shell session restart ({e})')
+
+                    self.close()
+
+                    if attempt:
+                        raise ShellSessionError(str(e))
+
+    def close(self):
+        if self.alive:
+            kill_group(self.process, self.startupinfo)
+
+        if self.process:
+            self.process.wait()
+
+            with suppress(OSError):
+                self.process.stdin.close()
+
+        self.process = None
 
 
 class ADBConnection:
     UNIX = ['linux', 'linux2', 'darwin']
+    ADB_TIMEOUT = 60 * 60 * 2
+    SHELL_TIMEOUT = 30
+    PROBE_END = 'EDPROBE:END'
+    PROBE_SCRIPT = 'for f in {paths}; do [ -f "$f" ] || continue; ' \
+                   's=$(stat -c %s:%Y "$f" 2>/dev/null) || s="$(wc -c < "$f"):0"; echo "$s:$f"; done; echo {end}'
+    MAX_CMD = 4000
+    CHUNK_READ = 'dd if={path} bs={chunk} skip={index} count=1 2>/dev/null'
+    CHUNK_HASHES = 'i={first}; while [ $i -lt {last} ]; do ' \
+                   'dd if={path} bs={chunk} skip=$i count=1 2>/dev/null | md5sum; i=$((i+1)); done'
+    CHUNK_RETRIES = 5
     MODES = {
         'download': 'download',
         'bootloader': 'bootloader',
@@ -28,14 +190,20 @@ class ADBConnection:
     def __init__(self, **kwargs):
         self.startupinfo = None
         self.adb_bin = None
+        self.serial = kwargs.get('serial')
         self.is_unix = sys.platform in self.UNIX
         self.rmr = b'\r\n'
-        self._run_opt = None
+        conf = Config()
+        self.adb_path = kwargs.get('adb_path') or conf('adb_path')
+        self.use_session = kwargs.get('use_session', bool(int(conf('adb_session'))))
+        self.chunk_size = kwargs.get('chunk_size') or int(conf('transfer_chunk'))
+        self.sessions = {}
+        self.session_failed = set()
+        self._is_adb_out_post_v5 = False
         self.setup_logging()
         self.setup()
-        self._is_adb_out_post_v5 = False
 
-        atexit.register(self.kill)
+        atexit.register(self.close_sessions if self.serial else self.kill)
 
     def setup_logging(self):
         self.logger = logging.getLogger(__name__)
@@ -44,14 +212,19 @@ class ADBConnection:
     def setup(self):
         self.logger.debug(f'Platform: {sys.platform}')
 
-        if self.is_unix:
-            self.adb_bin = self._get_adb_bin()
+        if not self.is_unix:
+            self._win_startupinfo()
+
+        if self.adb_path:
+            self.adb_bin = self.adb_path
 
-            self.logger.debug(f'Using adb binary: {self.adb_bin}')
+        elif self.is_unix:
+            self.adb_bin = self._get_adb_bin()
 
         else:
             self.adb_bin = os.path.join(CODEPATH, 'bin', 'adb.exe')
-            self._win_startupinfo()
+
+        self.logger.debug(f'Using adb binary: {self.adb_bin}')
 
         if not self.adb_bin or not os.path.exists(self.adb_bin):
             self.logger.warning('ADB binary is not found!')
@@ -65,35 +238,91 @@ class ADBConnection:
         self.startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
         self.rmr = b'\r\r\n'
 
-    def _opt_use_capture(self):
-        return tuple(sys.version_info) >= (3, 7)
+    def run(self, cmd, timeout=None):
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            startupinfo=self.startupinfo,
+            **group_opt()
+        )
 
-    @property
-    def run_opt(self):
-        if not self._run_opt:
-            opt = {'shell': False, 'startupinfo': self.startupinfo}
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
 
-            if self._opt_use_capture():
-                opt['capture_output'] = True
+        except subprocess.TimeoutExpired:
+            kill_group(process, self.startupinfo)
+            process.communicate()
 
-            else:
-                opt['stdout'] = subprocess.PIPE
+            raise TimeoutError(f'Command timed out after {timeout}s: {cmd}')
 
-            self._run_opt = opt
+        except BaseException:
+            kill_group(process, self.startupinfo)
+            process.wait()
 
-        return self._run_opt
+            raise
 
-    @timeout(60 * 60 * 2, use_signals=False)
-    def adb(self, cmd, binary=False, su=False, _for_out=False, **kwargs):
+        return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+    def adb(self, cmd, binary=False, su=False, _for_out=False, timeout=None, **kwargs):
         cmd = self._get_adb_cmd(cmd, su, _for_out)
-        
-        run = subprocess.run([self.adb_bin, *cmd], **self.run_opt)
+
+        run = self.run([*self.adb_cmd, *cmd], timeout=self.ADB_TIMEOUT if timeout is None else timeout)
 
         return self._return_run_output(run, binary)
 
     def adb_out(self, cmd, binary=False, su=False, **kwargs):
         return self.adb(cmd, binary=binary, su=su, _for_out=True, **kwargs)
 
+    def session(self, su=False):
+        if not self.use_session or su in self.session_failed:
+            return None
+
+        if su not in self.sessions:
+            self.sessions[su] = ShellSession(self.adb_cmd, su=su, startupinfo=self.startupinfo, logger=self.logger)
+
+        return self.sessions[su]
+
+    def session_ready(self, su=False):
+        session = self.session(su)
+
+        if session and not session.alive:
+            try:
+                with session.lock:
+                    session.start()
+
+            except (OSError, ShellSessionError) as e:
+                self.logger.debug(f'Shell session unavailable ({e})')
+
+                session.close()
+
+                self.session_failed.add(su)
+
+        return su not in self.session_failed and session is not None
+
+    def shell(self, cmd, binary=False, su=False, timeout=None, **kwargs):
+        if self.session_ready(su):
+            try:
+                output, code = self.sessions[su].run(cmd, timeout)
+
+                if binary:
+                    return output if code == 0 else b''
+
+                return output.decode(errors='replace').strip()
+
+            except ShellSessionError as e:
+                self.logger.debug(f'Shell session failed ({e})')
+
+                self.session_failed.add(su)
+
+        return self.adb_out(cmd, binary=binary, su=su, timeout=timeout, **kwargs)
+
+    def close_sessions(self):
+        for session in self.sessions.values():
+            session.close()
+
+        self.sessions.clear()
+
     def _get_adb_cmd(self, cmd, su, _for_out):
         if isinstance(cmd, str):
             cmd = self.split_cmd(cmd)
@@ -142,19 +371,28 @@ class ADBConnection:
 
         return rc
 
-    def device(self):
-        dev = self.adb('devices', timeout=5)
+    @property
+    def adb_cmd(self):
+        return [self.adb_bin, '-s', self.serial] if self.serial else [self.adb_bin]
 
-        if dev:
-            dev = dev.split('\n')
+    def devices(self):
+        return self.parse_devices(self.adb('devices', timeout=5))
 
-            if len(dev) > 1:
-                dev = dev[1].split('\t')
+    def parse_devices(self, dev):
+        if not dev:
+            self.logger.error('ADB binary cannot be used to check for connected devices!')
 
-                return dev
+            return []
 
-        else:
-            self.logger.error('ADB binary cannot be used to check for connected devices!')
+        return [line.split('\t')[:2] for line in dev.split('\n')[1:] if '\t' in line]
+
+    def device(self):
+        return self.pick_device(self.devices())
+
+    def pick_device(self, devices):
+        for dev in devices:
+            if not self.serial or dev[0] == self.serial:
+                return dev
 
         return None, None
 
@@ -162,15 +400,16 @@ class ADBConnection:
         self.adb('start-server', timeout=10)
 
     def kill(self):
+        self.close_sessions()
         self.adb('kill-server', timeout=5)
 
     @staticmethod
     def _file_regex(fp):
         return re.compile(f'^{fp.replace("*", "(.+?)")}$')
 
-    def exists(self, file_path):
+    def exists(self, file_path, su=False):
         file_path_strict = self.strict_name(file_path)
-        file_remote = self.adb_out(f'ls {file_path_strict}')
+        file_remote = self.shell(f'ls {file_path_strict}', su=su)
 
         if not file_remote:
             return None
@@ -178,26 +417,73 @@ class ADBConnection:
         if re.match(self._file_regex(file_path), file_remote):
             return file_remote
 
-    def get_file(self, file_path):
+    def get_file(self, file_path, su=False):
         file_path_strict = self.strict_name(file_path)
 
-        data = self.adb_out(f'cat {file_path_strict}', binary=True)
+        data = self.shell(f'cat {file_path_strict}', binary=True, su=su)
 
         return data
 
+    def chunk_hashes(self, file_path, first, last, su=False):
+        script = self.CHUNK_HASHES.format(path=shlex.quote(file_path), chunk=self.chunk_size, first=first, last=last)
+
+        hashes = re.findall(r'^([0-9a-f]{32})\b', self.run_script(script, su=su) or '', re.M)
+
+        return hashes if len(hashes) == last - first else None
+
+    def read_chunk(self, file_path, index, su=False):
+        script = self.CHUNK_READ.format(path=shlex.quote(file_path), chunk=self.chunk_size, index=index)
+
+        return self.run_script(script, binary=True, su=su) or b''
+
+    def fetch_file(self, file_path, dst_path, size, su=False):
+        if size is None or size < 0:
+            self.logger.debug(f'Unknown size for {file_path}, not fetching')
+
+            return False
+
+        count = -(-size // self.chunk_size)
+
+        hashes = self.chunk_hashes(file_path, 0, count, su=su)
+
+        if hashes is None:
+            self.logger.debug(f'No remote md5sum, verifying {file_path} by size only')
+
+        with open(dst_path, 'wb') as W:
+            for index in range(count):
+                expected = min(self.chunk_size, size - index * self.chunk_size)
+
+                for attempt in range(self.CHUNK_RETRIES):
+                    data = self.read_chunk(file_path, index, su=su)
+
+                    if len(data) == expected and (hashes is None or hashlib.md5(data).hexdigest() == hashes[index]):
+                        break
+
+                    self.logger.debug(f'Chunk {index} of {file_path} mismatched ({len(data)} bytes), fetching again')
+
+                    if hashes is not None:
+                        hashes[index] = (self.chunk_hashes(file_path, index, index + 1, su=su) or [None])[0]
+
+                else:
+                    return False
+
+                W.write(data)
+
+        return True
+
     def pull_file(self, file_path, dst_path):
         file_path_strict = re.sub(' ', r'\ ', file_path)
         dst_path_strict = re.sub(' ', r'\ ', dst_path)
 
         self.adb(f'pull {file_path_strict} "{dst_path_strict}"')
 
-    def get_size(self, file_path):
+    def get_size(self, file_path, su=False):
         file_path_strict = self.strict_name(file_path)
 
         size_functions = [
-            lambda: self.adb_out(f'stat -c %s {file_path_strict}'),
-            lambda: self.adb_out(f'ls -nl {file_path_strict}').split()[3],
-            lambda: self.adb_out(f'wc -c < {file_path_strict}')
+            lambda: self.shell(f'stat -c %s {file_path_strict}', su=su),
+            lambda: self.shell(f'ls -nl {file_path_strict}', su=su).split()[3],
+            lambda: self.shell(f'wc -c < {file_path_strict}', su=su)
         ]
 
         for size_function in size_functions:
@@ -210,11 +496,105 @@ class ADBConnection:
 
         return -1
 
-    @timeout(30, use_signals=False)
-    def cmd_shell(self, cmd, code = False):
+    @staticmethod
+    def glob_quote(file_path):
+        return '*'.join(map(shlex.quote, file_path.split('*')))
+
+    @staticmethod
+    def script_cmd(script, su=False):
+        return ['su', '-c', shlex.quote(script)] if su else [script]
+
+    def run_script(self, script, binary=False, su=False):
+        if self.session_ready(su):
+            return self.shell(script, binary=binary, su=su)
+
+        output = self.adb(self.script_cmd(script, su), binary=binary, _for_out=True)
+
+        if binary and not isinstance(output, bytes):
+            return b''
+
+        return output
+
+    def probe_script(self, file_paths):
+        return self.PROBE_SCRIPT.format(paths=' '.join(map(self.glob_quote, file_paths)), end=self.PROBE_END)
+
+    def cmd_batches(self, file_paths, build):
+        batch = []
+
+        for file_path in file_paths:
+            if batch and len(' '.join(build([*batch, file_path]))) > self.MAX_CMD:
+                yield batch
+
+                batch = []
+
+            batch.append(file_path)
+
+        if batch:
+            yield batch
+
+    def probe_files(self, file_paths, su=False):
+        stats = {}
+
+        if self.session_ready(su):
+            batches = [file_paths]
+        else:
+            batches = self.cmd_batches(file_paths, lambda batch: self.script_cmd(self.probe_script(batch), su))
+
+        for batch in batches:
+            output = self.run_script(self.probe_script(batch), su=su) or ''
+
+            lines = output.splitlines()
+
+            if self.PROBE_END not in map(str.strip, lines):
+                self.logger.debug(f'Probe failed for {len(batch)} paths')
+
+                return None
+
+            for line in lines:
+                size, mtime, name = (line.strip().split(':', 2) + ['', ''])[:3]
+
+                if size.isdigit() and mtime.isdigit():
+                    stats[name] = {'size': int(size), 'mtime': int(mtime)}
+
+        self.logger.debug(f'Probe: {len(stats)} files for {len(file_paths)} paths')
+
+        return stats
+
+    @property
+    def can_stream(self):
+        return self._is_adb_out_post_v5
+
+    def tar_command(self, file_paths, su=False):
+        script = f'tar -cf - {" ".join(map(shlex.quote, file_paths))} 2>/dev/null'
+
+        return ['exec-out', *self.script_cmd(script, su)]
+
+    @contextmanager
+    def tar_stream(self, file_paths, su=False):
+        cmd = [*self.adb_cmd, *self.tar_command(file_paths, su)]
+
+        self.logger.debug(f'ADB tar: {len(file_paths)} files')
+
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            startupinfo=self.startupinfo,
+            **group_opt()
+        )
+
+        try:
+            yield process.stdout
+        finally:
+            kill_group(process, self.startupinfo)
+
+            process.wait()
+            process.stdout.close()
+
+    def cmd_shell(self, cmd, code = False, timeout=SHELL_TIMEOUT):
         self.logger.debug(f'Shell cmd: {cmd}')
 
-        run = subprocess.run(self.split_cmd(cmd), **self.run_opt)
+        run = self.run(self.split_cmd(cmd), timeout=timeout)
 
         if code:
             return run.returncode
@@ -226,7 +606,7 @@ class ADBConnection:
         return self.cmd_shell('which adb') or None
 
     def _adb_has_exec(self):
-        cmd = f'{self.adb_bin} exec-out id'
+        cmd = ' '.join([*self.adb_cmd, 'exec-out', 'id'])
 
         return self.cmd_shell(cmd, code=True) == 0
 
@@ -255,5 +635,122 @@ class ADBConnection:
         return file_path
 
 
+class AsyncADBConnection:
+    _limiters = weakref.WeakKeyDictionary()
+
+    def __init__(self, adb=None, limit=None, **kwargs):
+        self.sync = adb or ADBConnection(**kwargs)
+        self.logger = kwargs.get('logger', self.sync.logger)
+        self.limit = limit or int(Config()('adb_async_limit'))
+
+    @property
+    def limiter(self):
+        limiters = self._limiters.setdefault(asyncio.get_running_loop(), {})
+
+        if self.sync.serial not in limiters:
+            limiters[self.sync.serial] = asyncio.Semaphore(self.limit)
+
+        return limiters[self.sync.serial]
+
+    async def kill(self, process):
+        if process.returncode is None:
+            kill_tree(process.pid, self.sync.startupinfo)
+
+        await process.wait()
+
+    async def spawn(self, cmd, **kwargs):
+        return await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=subprocess.PIPE,
+            startupinfo=self.sync.startupinfo,
+            **group_opt(),
+            **kwargs
+        )
+
+    async def run(self, cmd, timeout=None):
+        async with self.limiter:
+            process = await self.spawn(cmd, stderr=subprocess.PIPE)
+
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+
+            except asyncio.TimeoutError:
+                await self.kill(process)
+
+                raise TimeoutError(f'Command timed out after {timeout}s: {cmd}')
+
+            except BaseException:
+                await self.kill(process)
+
+                raise
+
+        return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+    async def adb(self, cmd, binary=False, su=False, _for_out=False, timeout=None, **kwargs):
+        cmd = self.sync._get_adb_cmd(cmd, su, _for_out)
+
+        run = await self.run([*self.sync.adb_cmd, *cmd], timeout=ADBConnection.ADB_TIMEOUT if timeout is None else timeout)
+
+        return self.sync._return_run_output(run, binary)
+
+    async def adb_out(self, cmd, binary=False, su=False, **kwargs):
+        return await self.adb(cmd, binary=binary, su=su, _for_out=True, **kwargs)
+
+    async def devices(self):
+        return self.sync.parse_devices(await self.adb('devices', timeout=5))
+
+    async def device(self):
+        return self.sync.pick_device(await self.devices())
+
+    async def exists(self, file_path, su=False):
+        file_path_strict = self.sync.strict_name(file_path)
+        file_remote = await self.adb_out(f'ls {file_path_strict}', su=su)
+
+        if not file_remote:
+            return None
+
+        if re.match(self.sync._file_regex(file_path), file_remote):
+            return file_remote
+
+    async def get_file(self, file_path, su=False):
+        file_path_strict = self.sync.strict_name(file_path)
+
+        return await self.adb_out(f'cat {file_path_strict}', binary=True, su=su)
+
+    async def get_size(self, file_path, su=False):
+        file_path_strict = self.sync.strict_name(file_path)
+
+        size = await self.adb_out(f'stat -c %s {file_path_strict}', su=su)
+
+        if not (size and size.isdigit()):
+            size = ((await self.adb_out(f'ls -nl {file_path_strict}', su=su)) or '').split()[3:4]
+            size = size[0] if size else None
+
+        if not (size and size.isdigit()):
+            size = await self.adb_out(f'wc -c < {file_path_strict}', su=su)
+
+        if size and size.isdigit():
+            return int(size)
+
+        self.logger.debug(f'Size Error for: {file_path}')
+
+        return -1
+
+    async def cmditer(self, cmd):
+        async with self.limiter:
+            process = await self.spawn(self.sync.split_cmd(cmd))
+
+            try:
+                async for output in process.stdout:
+                    yield output.decode().rstrip()
+
+            finally:
+                await self.kill(process)
+
+
 class ADBConnectionError(Exception):
     pass
+
+
+class ShellSessionError(ADBConnectionError):
+    pass
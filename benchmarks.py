@@ -0,0 +1,373 @@
+import os
+import sys
+import atexit
+import stat
+import zlib
+import subprocess
+import hashlib
+import argparse
+import functools
+import itertools
+import string
+import tempfile
+import time
+import adb_connection
+import config
+import cracking
+import decoders
+import detective
+import utils
+from Cryptodome.Cipher import AES
+from Cryptodome.Util.Padding import pad
+
+
+def _rate(count, seconds):
+    return f'{int(count / seconds):>12,} /sec'
+
+
+def _legacy_make_pin(pin, length):
+    return ''.join(pin).zfill(length).encode()
+
+
+def _legacy_sam_algo(salt, pin, times=1024):
+    base = hashlib.sha1(b'0' + pin + salt).digest()
+
+    for i in range(1, times):
+        base = hashlib.sha1(base + f'{i}'.encode() + pin + salt).digest()
+
+    return base
+
+
+def _legacy_gen_algo(salt, pin):
+    return hashlib.sha1(pin + salt).digest()
+
+
+def _legacy_crack(key, feed, algo, update_rate, tk_obj=None):
+    for n, pin in enumerate(feed, start=1):
+        if not n % update_rate and tk_obj:
+            tk_obj.set(pin.decode())
+
+        if algo(pin) == key:
+            return pin
+
+
+def bench_cracking(args):
+    salt = 1234567890123456789
+
+    modes = {
+        'generic': (False, args.count),
+        'samsung': (True, max(1, args.count // 1024)),
+    }
+
+    for mode, (samsung, count) in modes.items():
+        length = max(4, len(str(count - 1)))
+        end = '9' * length
+
+        crack = cracking.PasswordCrack('0' * 40, salt, end=end, samsung=samsung)
+        first = crack.pin_index('0' * length)
+
+        feed = itertools.islice(
+            map(lambda x: _legacy_make_pin(x, length), itertools.product(string.digits, repeat=length)),
+            count
+        )
+        algo = functools.partial(_legacy_sam_algo if samsung else _legacy_gen_algo, crack.salt)
+
+        started = time.perf_counter()
+        _legacy_crack(crack.key, feed, algo, crack.update_rate)
+        before = time.perf_counter() - started
+
+        engine = crack.get_engine()
+
+        started = time.perf_counter()
+
+        for _, batch, _ in crack._feed_batches(first, first + count, crack.update_rate):
+            engine.search(batch, crack.key)
+
+        after = time.perf_counter() - started
+
+        print(f'{mode:<8} {count:>10,} candidates   before {_rate(count, before)}   after {_rate(count, after)}'
+              f'   x{before / after:.2f}')
+
+
+def _legacy_ab_to_tar(input_file, output_file, buffer=2**20):
+    with open(input_file, 'rb') as backup_file, open(output_file, 'wb') as W:
+        backup_file.seek(24)
+
+        zlib_obj = zlib.decompressobj()
+
+        while True:
+            d = backup_file.read(buffer)
+
+            if not d:
+                break
+
+            W.write(zlib_obj.decompress(d))
+
+        W.write(zlib_obj.flush())
+
+
+def encryption_header(password, rounds=10000):
+    user_salt, checksum_salt, user_iv, key, iv = (os.urandom(n) for n in (64, 64, 16, 32, 16))
+
+    user_key = hashlib.pbkdf2_hmac('sha1', password.encode(), user_salt, rounds, 32)
+    mangled = utils.DetectiveTools.mangle_key(key)
+    checksum = hashlib.pbkdf2_hmac('sha1', mangled, checksum_salt, rounds, 32)
+
+    blob = b''.join(bytes([len(f)]) + f for f in (iv, key, checksum))
+    blob = AES.new(user_key, AES.MODE_CBC, user_iv).encrypt(pad(blob, AES.block_size))
+
+    lines = [utils.DetectiveTools.AB_ENCRYPTION, user_salt.hex(), checksum_salt.hex(), str(rounds),
+             user_iv.hex(), blob.hex()]
+
+    return ''.join(f'{x.upper()}\n' for x in lines).encode(), AES.new(key, AES.MODE_CBC, iv)
+
+
+def make_backup(file_path, size, block=2**20, password=None):
+    pool = [os.urandom(block // 4) + bytes(block // 4) + string.printable.encode() * (block // 200)
+            for _ in range(16)]
+
+    zlib_obj = zlib.compressobj(1)
+
+    with open(file_path, 'wb') as W:
+        W.write(b'ANDROID BACKUP\n5\n1\n')
+
+        if password:
+            header, cipher = encryption_header(password)
+
+            W.write(header)
+        else:
+            W.write(b'none\n')
+
+        tail = b''
+
+        def write(d, final=False):
+            nonlocal tail
+
+            if not password:
+                return W.write(d)
+
+            d = tail + d
+
+            if final:
+                return W.write(cipher.encrypt(pad(d, AES.block_size)))
+
+            size_ = len(d) - len(d) % AES.block_size
+            tail = d[size_:]
+
+            W.write(cipher.encrypt(d[:size_]))
+
+        written = 0
+
+        for d in itertools.cycle(pool):
+            if written >= size:
+                break
+
+            d = d[:size - written]
+
+            write(zlib_obj.compress(d))
+
+            written += len(d)
+
+        write(zlib_obj.flush(), final=True)
+
+
+def bench_inflate(args):
+    for gb in args.sizes:
+        size = int(gb * 2 ** 30)
+
+        ab_file = os.path.join(args.dir, f'bench_{gb}GB.ab')
+        tar_file = f'{ab_file}.tar'
+
+        aes_file = os.path.join(args.dir, f'bench_{gb}GB_aes.ab')
+
+        make_backup(ab_file, size)
+
+        try:
+            started = time.perf_counter()
+            _legacy_ab_to_tar(ab_file, tar_file, args.buffer)
+            before = time.perf_counter() - started
+
+            started = time.perf_counter()
+            utils.DetectiveTools.ab_to_tar(ab_file, buffer=args.buffer, depth=args.depth)
+            after = time.perf_counter() - started
+
+            line = (f'{gb:>6} GB   before {size / 2 ** 20 / before:>9,.1f} MB/s   after {size / 2 ** 20 / after:>9,.1f} '
+                    f'MB/s   x{before / after:.2f}')
+
+            if args.encrypted:
+                os.remove(ab_file)
+
+                make_backup(aes_file, size, password=args.encrypted)
+
+                started = time.perf_counter()
+                utils.DetectiveTools.ab_to_tar(aes_file, buffer=args.buffer, depth=args.depth,
+                                               password=args.encrypted)
+                aes = time.perf_counter() - started
+
+                line += f'   encrypted {size / 2 ** 20 / aes:>9,.1f} MB/s'
+
+        finally:
+            for f in (ab_file, tar_file, aes_file, f'{aes_file}.tar'):
+                if os.path.exists(f):
+                    os.remove(f)
+
+        print(f'{line}   (buffer {utils.human_bytes(args.buffer)}, depth {args.depth})')
+
+
+FAKE_ADB = '''#!/bin/sh
+[ "$1" = -s ] && shift 2
+case "$1" in
+    exec-out|shell) shift; [ "$1" = -T ] && exec sh; exec sh -c "$*";;
+    devices) printf 'List of devices attached\\nBENCH\\tdevice\\n';;
+esac
+'''
+
+
+def _legacy_adb(adb_bin):
+    from wrapt_timeout_decorator import timeout
+
+    @timeout(60 * 60 * 2, use_signals=False)
+    def adb(cmd):
+        return subprocess.run([adb_bin, *cmd], shell=False, capture_output=True).stdout
+
+    return adb
+
+
+def _latency(count, call):
+    started = time.perf_counter()
+
+    for _ in range(count):
+        call()
+
+    return (time.perf_counter() - started) / count
+
+
+def bench_adb(args):
+    if sys.platform == 'win32':
+        return print('adb benchmark needs a POSIX shell for the fake adb binary')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        adb_bin = os.path.join(tmp_dir, 'adb')
+
+        with open(adb_bin, 'w') as W:
+            W.write(FAKE_ADB)
+
+        os.chmod(adb_bin, os.stat(adb_bin).st_mode | stat.S_IXUSR)
+        os.environ['PATH'] = f'{tmp_dir}{os.pathsep}{os.environ["PATH"]}'
+
+        adb = adb_connection.ADBConnection(use_session=True)
+
+        rows = []
+
+        try:
+            legacy = _legacy_adb(adb_bin)
+
+            rows.append(('before', _latency(args.count, lambda: legacy(['exec-out', 'id']))))
+        except ImportError:
+            print('wrapt_timeout_decorator is not installed, skipping the "before" run')
+
+        rows.append(('after', _latency(args.count, lambda: adb.adb_out('id'))))
+        rows.append(('session', _latency(args.count, lambda: adb.shell('id'))))
+
+        adb.kill()
+        atexit.unregister(adb.kill)
+
+    base = rows[0][1]
+
+    for name, seconds in rows:
+        print(f'{name:<8} {args.count:>6} x exec-out id   {seconds * 1000:>8.2f} ms/call   x{base / seconds:.2f}')
+
+
+def make_device(root, size):
+    for link in decoders.Registry().get_root_links():
+        path = f'{root}{link.replace("*", "0")}'
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        if not link.endswith(('-shm', '-wal', '-journal')):
+            with open(path, 'wb') as W:
+                W.write(config.SQLITE_MAGIC + os.urandom(size - len(config.SQLITE_MAGIC)))
+
+    os.makedirs(os.path.join(root, 'system'), exist_ok=True)
+
+    with open(os.path.join(root, 'system', 'build.prop'), 'w') as W:
+        W.write('ro.product.manufacturer=Simulator\nro.product.model=Bench\n')
+
+
+def bench_acquisition(args):
+    fake_adb = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_adb.py')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        device_dir = os.path.join(tmp_dir, 'device')
+
+        make_device(device_dir, args.size)
+
+        limit = f'{utils.human_bytes(args.bandwidth)}/s' if args.bandwidth else 'unlimited'
+
+        os.environ.update({
+            'FAKE_ADB_ROOT': device_dir,
+            'FAKE_ADB_MODE': args.mode,
+            'FAKE_ADB_LATENCY': str(args.latency),
+            'FAKE_ADB_BANDWIDTH': str(args.bandwidth)
+        })
+
+        for name, bulk, session in [('per-file', False, False), ('session', False, True), ('bulk', True, True)]:
+            case_dir = os.path.join(tmp_dir, name)
+            os.makedirs(case_dir)
+
+            adb = adb_connection.ADBConnection(adb_path=fake_adb, use_session=session)
+
+            atexit.unregister(adb.kill)
+
+            case = detective.ChainExecution(case_dir, use_adb=True, adb=adb, bulk=bulk)
+
+            case.InitialAdbRead()
+            case.CreateWorkDir()
+
+            started = time.perf_counter()
+            case.DataAcquisition()
+            seconds = time.perf_counter() - started
+
+            case.DataStore.close()
+            adb.close_sessions()
+
+            total = sum(os.path.getsize(os.path.join(case.output_dir, f)) for f in os.listdir(case.output_dir))
+
+            print(f'{name:<9} {args.mode:<5} {len(os.listdir(case.output_dir)):>4} files   '
+                  f'{total / 2 ** 20 / seconds:>8,.1f} MB/s   {seconds:>7.2f} s   '
+                  f'(latency {args.latency} ms, bandwidth {limit})')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evil Detective micro-benchmarks')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    crack_parser = subparsers.add_parser('cracking', help='PIN candidates/sec, generic and Samsung hashing')
+    crack_parser.add_argument('--count', type=int, default=10 ** 6, help='generic candidates (Samsung uses count/1024)')
+    crack_parser.set_defaults(func=bench_cracking)
+
+    inflate_parser = subparsers.add_parser('inflate', help='ab_to_tar MB/s on synthetic backups')
+    inflate_parser.add_argument('--sizes', type=float, nargs='+', default=[1, 10, 50], help='backup sizes in GB')
+    inflate_parser.add_argument('--buffer', type=int, default=2**20, help='read size in bytes')
+    inflate_parser.add_argument('--depth', type=int, default=8, help='queued blocks between pipeline stages')
+    inflate_parser.add_argument('--encrypted', metavar='PASSWORD', help='also time an AES-256 backup')
+    inflate_parser.add_argument('--dir', default=tempfile.gettempdir(), help='scratch directory for backups')
+    inflate_parser.set_defaults(func=bench_inflate)
+
+    adb_parser = subparsers.add_parser('adb', help='per-command latency of trivial adb calls against a fake adb')
+    adb_parser.add_argument('--count', type=int, default=500, help='calls per run')
+    adb_parser.set_defaults(func=bench_adb)
+
+    acq_parser = subparsers.add_parser('acquisition', help='root acquisition throughput against the fake_adb.py simulator')
+    acq_parser.add_argument('--size', type=int, default=2**20, help='bytes per synthetic database')
+    acq_parser.add_argument('--mode', choices=['root', 'su'], default='root', help='simulated device permission')
+    acq_parser.add_argument('--latency', type=int, default=0, help='added milliseconds per adb round trip')
+    acq_parser.add_argument('--bandwidth', type=int, default=0, help='transfer limit in bytes/sec (0 = unlimited)')
+    acq_parser.set_defaults(func=bench_acquisition)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
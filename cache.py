@@ -0,0 +1,173 @@
+import os
+import time
+import pickle
+import sqlite3
+import hashlib
+import logging
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class DecodeCache:
+    DB_NAME = 'decode_cache.sqlite'
+    SIDECARS = ['-wal', '-journal']
+
+    def __init__(self, cache_dir=None, limit=None, enabled=True, **kwargs):
+        conf = config.Config()
+
+        self.logger = kwargs.get('logger', logger)
+        self.cache_dir = cache_dir or conf.appdirs.user_cache_dir
+        self.limit = int(conf('decode_cache_mb')) * 2**20 if limit is None else limit
+        self.context = f'{conf("time_zone")}|{conf("date_format")}'
+        self.enabled = enabled and self.limit > 0
+        self.conn = None
+
+        if self.enabled:
+            try:
+                self.open()
+
+            except Exception as e:
+                self.logger.warning(f'Decode cache disabled: {e}')
+
+                self.close()
+
+                self.enabled = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def open(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.conn = sqlite3.connect(os.path.join(self.cache_dir, self.DB_NAME), timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, data BLOB, size INTEGER, accessed REAL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+        self.conn.commit()
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+
+            self.conn = None
+
+    def file_digest(self, file_path, buff=2**20):
+        if not self.enabled:
+            return None
+
+        hasher = hashlib.sha256()
+
+        try:
+            for suffix in ['', *self.SIDECARS]:
+                path = f'{file_path}{suffix}'
+
+                if not os.path.isfile(path):
+                    continue
+
+                hasher.update(suffix.encode())
+
+                with open(path, 'rb') as R:
+                    for d in iter(lambda: R.read(buff), b''):
+                        hasher.update(d)
+
+        except OSError as e:
+            self.logger.warning(f'Decode cache skipped `{os.path.basename(file_path)}`: {e}')
+
+            return None
+
+        return hasher.hexdigest()
+
+    @staticmethod
+    def neighbours(file_path, deco_class):
+        input_dir = os.path.dirname(file_path)
+
+        return [os.path.join(input_dir, target) for target in sorted({t for _, t in deco_class.EXTRAS})]
+
+    def key(self, digest, deco_class, file_path=None):
+        if digest is None:
+            return None
+
+        parts = [digest]
+
+        if file_path:
+            for neighbour in self.neighbours(file_path, deco_class):
+                if os.path.isfile(neighbour):
+                    extra = self.file_digest(neighbour)
+
+                    if extra is None:
+                        return None
+
+                    parts.append(f'{os.path.basename(neighbour)}:{extra}')
+
+        name = f'{deco_class.__module__}.{deco_class.__qualname__}'
+
+        return hashlib.sha256(f'{"|".join(parts)}|{name}|{deco_class.version}|{self.context}'.encode()).hexdigest()
+
+    def get(self, key):
+        if not self.enabled or key is None:
+            return None
+
+        try:
+            row = self.conn.execute('SELECT data FROM entries WHERE key = ?', (key,)).fetchone()
+
+            if row is None:
+                return None
+
+            self.conn.execute('UPDATE entries SET accessed = ? WHERE key = ?', (time.time(), key))
+            self.conn.commit()
+
+            return pickle.loads(row[0])
+
+        except Exception as e:
+            self.logger.warning(f'Decode cache read failed: {e}')
+
+    def put(self, key, DATA):
+        if not self.enabled or key is None:
+            return
+
+        try:
+            blob = pickle.dumps(DATA, protocol=pickle.HIGHEST_PROTOCOL)
+
+            if len(blob) > self.limit:
+                return
+
+            self.conn.execute(
+                'INSERT OR REPLACE INTO entries (key, data, size, accessed) VALUES (?, ?, ?, ?)',
+                (key, blob, len(blob), time.time())
+            )
+            self.evict()
+            self.conn.commit()
+
+        except Exception as e:
+            self.logger.warning(f'Decode cache write failed: {e}')
+
+    def evict(self):
+        total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+        if total <= self.limit:
+            return
+
+        stale = []
+
+        for key, size in self.conn.execute('SELECT key, size FROM entries ORDER BY accessed'):
+            stale.append((key,))
+
+            total -= size
+
+            if total <= self.limit:
+                break
+
+        self.conn.executemany('DELETE FROM entries WHERE key = ?', stale)
+
+        self.logger.debug(f'cache:evicted:{len(stale)}')
+
+    def clear(self):
+        if self.enabled:
+            self.conn.execute('DELETE FROM entries')
+            self.conn.commit()
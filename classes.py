@@ -5,6 +5,9 @@ import re
 import base64
 import pathlib
 import functools
+import itertools
+import collections
+import inspect
 import datetime
 import logging
 import config
@@ -15,6 +18,24 @@ logger = logging.getLogger(__name__)
 
 
 def sqlite_error_retry(method):
+    if inspect.isgeneratorfunction(method):
+        @functools.wraps(method)
+        def generator(*args, **kwargs):
+            n = 0
+
+            try:
+                for n, row in enumerate(method(*args, **kwargs), start=1):
+                    yield row
+            except sqlite3.OperationalError as err:
+                if 'UTF-8' not in str(err):
+                    raise err
+
+                retry = method(*args, **kwargs, cursor_kw={'text_factory': AndroidDecoder.decode_safe})
+
+                yield from itertools.islice(retry, n, None)
+
+        return generator
+
     @functools.wraps(method)
     def decorator(*args, **kwargs):
         try:
@@ -28,6 +49,38 @@ def sqlite_error_retry(method):
     return decorator
 
 
+class ConnectionPool:
+    def __init__(self):
+        self.connections = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get(self, file_path, text_factory=None):
+        return self.connections.get((file_path, text_factory))
+
+    def open(self, file_path, uri, text_factory=None):
+        conn = sqlite3.connect(uri, uri=True)
+
+        if text_factory:
+            conn.text_factory = text_factory
+
+        self.connections[(file_path, text_factory)] = conn
+
+        logger.debug(f'pool:open:{file_path}')
+
+        return conn
+
+    def close(self):
+        for conn in self.connections.values():
+            conn.close()
+
+        self.connections.clear()
+
+
 class AndroidDecoder:
     TARGET = None
     RETARGET = None
@@ -37,7 +90,10 @@ class AndroidDecoder:
     exclude_from_menus = False
     exclude_from_registry = False
     exclude_from_decoding = False
+    SCAN = None
     target_is_db = None
+    fetch_size = 1000
+    version = 1
     title = None
     template_name = None
     headers = {}
@@ -46,6 +102,10 @@ class AndroidDecoder:
         self.work_dir = work_dir
         self.input_file = input_file
         self.logger = kwargs.get('logger', logger)
+        self.pool_shared = 'pool' in kwargs
+
+        if self.pool_shared:
+            self._pool = kwargs['pool']
 
         if not stage:
             self.logger.debug(f'decoder:{type(self).__name__}')
@@ -53,7 +113,11 @@ class AndroidDecoder:
             self.logger.debug(f'input_file:{input_file}')
 
             self.DATA = []
-            self.main()
+
+            try:
+                self.main()
+            finally:
+                self.close()
 
     @property
     def conf(self):
@@ -62,9 +126,40 @@ class AndroidDecoder:
 
         return self._conf
 
+    @property
+    def pool(self):
+        if not hasattr(self, '_pool'):
+            self._pool = ConnectionPool()
+
+        return self._pool
+
     def main(self):
+        if self.SCAN:
+            self.prepare()
+
+            for i in self.sql_table_iter(**self.SCAN):
+                self.DATA.append(self.process_row(i))
+
+    def prepare(self):
         pass
 
+    def process_row(self, item):
+        return item
+
+    @classmethod
+    def scan_key(cls):
+        if cls.SCAN:
+            return (
+                cls.SCAN['table'],
+                tuple(cls.SCAN.get('columns', '*')),
+                cls.SCAN.get('order_by'),
+                cls.SCAN.get('order', 'DESC')
+            )
+
+    def close(self):
+        if hasattr(self, '_pool') and not self.pool_shared:
+            self._pool.close()
+
     @property
     def target_path_ab(self):
         return self.gen_target_path(self, is_ab=True)
@@ -115,16 +210,17 @@ class AndroidDecoder:
 
         return False
 
-    def add_extra(self, namespace, target):
+    @classmethod
+    def extra(cls, namespace, target):
         class Extra(AndroidDecoder):
             TARGET = target
             NAMESPACE = namespace
-            PACKAGE = self.PACKAGE
+            PACKAGE = cls.PACKAGE
 
-        self.EXTRAS.append(Extra)
+        return Extra
 
     def get_extras(self, **kwargs):
-        return [self.gen_target_path(xtr, **kwargs) for xtr in self.EXTRAS]
+        return [self.gen_target_path(self.extra(*xtr), **kwargs) for xtr in self.EXTRAS]
 
     @staticmethod
     def name_val(d, key='name', value='value'):
@@ -158,15 +254,21 @@ class AndroidDecoder:
     def zipper(row):
         return dict(zip(row.keys(), row))
 
+    def get_connection(self, text_factory=None):
+        conn = self.pool.get(self.input_file, text_factory)
+
+        if not conn:
+            conn = self.pool.open(self.input_file, self.sqlite_readonly, text_factory=text_factory)
+
+        return conn
+
     def get_cursor(self, row_factory=None, text_factory=None):
-        with sqlite3.connect(self.sqlite_readonly, uri=True) as conn:
-            if row_factory:
-                conn.row_factory = row_factory
+        cur = self.get_connection(text_factory=text_factory).cursor()
 
-            if text_factory:
-                conn.text_factory = text_factory
+        if row_factory:
+            cur.row_factory = row_factory
 
-            return conn.cursor()
+        return cur
 
     def get_sql_tables(self, cursor_kw={}):
         cur = self.get_cursor(**cursor_kw)
@@ -178,22 +280,46 @@ class AndroidDecoder:
 
         return tuple(x[1] for x in cur.execute(f'PRAGMA table_info({table_name})'))
 
-    @sqlite_error_retry
-    def sql_table_as_dict(self, table, columns='*', order_by=None, order='DESC', where={}, cursor_kw={}):
-        cur = self.get_cursor(row_factory=sqlite3.Row, **cursor_kw)
-
+    def sql_query(self, table, columns='*', order_by=None, order='DESC', where={}):
         query = f'SELECT {",".join(columns)} FROM {table}'
 
         if where:
-            query += f' WHERE {self.where(where)}'
+            query += f' WHERE {where if isinstance(where, str) else self.where(where)}'
 
         if order_by:
             query += f' ORDER BY {order_by} {order}'
 
         self.logger.debug(f'SQL> {query}')
 
+        return query
+
+    @sqlite_error_retry
+    def sql_table_as_dict(self, table, columns='*', order_by=None, order='DESC', where={}, cursor_kw={}):
+        cur = self.get_cursor(row_factory=sqlite3.Row, **cursor_kw)
+
+        query = self.sql_query(table, columns=columns, order_by=order_by, order=order, where=where)
+
         return [*map(self.zipper, cur.execute(query))]
 
+    @sqlite_error_retry
+    def sql_table_iter(self, table, columns='*', order_by=None, order='DESC', where={}, batch_size=None, cursor_kw={}):
+        cur = self.get_cursor(row_factory=sqlite3.Row, **cursor_kw)
+
+        query = self.sql_query(table, columns=columns, order_by=order_by, order=order, where=where)
+
+        cur.execute(query)
+
+        try:
+            while True:
+                rows = cur.fetchmany(batch_size or self.fetch_size)
+
+                if not rows:
+                    break
+
+                yield from map(self.zipper, rows)
+        finally:
+            cur.close()
+
     def sql_table_rows(self, table, columns='*', where={}, cursor_kw={}):
         cur = self.get_cursor(**cursor_kw)
 
@@ -416,5 +542,111 @@ class AndroidDecoder:
             yield sub
 
 
+class SharedScan:
+    def __init__(self, decoders, work_dir, input_file, pool, **kwargs):
+        self.decoders = decoders
+        self.work_dir = work_dir
+        self.input_file = input_file
+        self.pool = pool
+        self.logger = kwargs.get('logger', logger)
+        self.RESULTS = {}
+
+    def stage(self):
+        staged = {}
+
+        for deco_class in self.decoders:
+            self.logger.debug(f'decoder:{deco_class.__name__}')
+
+            deco = deco_class(self.work_dir, self.input_file, stage=True, pool=self.pool)
+            deco.DATA = []
+
+            try:
+                deco.prepare()
+
+                staged[deco_class] = deco
+            except Exception as e:
+                self.RESULTS[deco_class] = None, e
+
+        return staged
+
+    FLAG = '__scan_{}'
+
+    @staticmethod
+    def combined_where(staged):
+        wheres = [deco.SCAN.get('where') for deco in staged]
+
+        if all(wheres):
+            return ' OR '.join(f'({deco.where(w)})' for deco, w in zip(staged, wheres))
+
+    def flags(self, staged):
+        return {
+            deco_class: (self.FLAG.format(n), f'CASE WHEN {deco.where(deco.SCAN["where"])} THEN 1 END')
+            for n, (deco_class, deco) in enumerate(staged.items()) if deco.SCAN.get('where')
+        }
+
+    def run(self):
+        staged = self.stage()
+
+        if not staged:
+            return self.RESULTS
+
+        lead = next(iter(staged.values()))
+
+        flags = self.flags(staged)
+        columns = [*lead.SCAN.get('columns', '*'), *(f'{expr} AS {name}' for name, expr in flags.values())]
+
+        scan = dict(lead.SCAN, columns=columns, where=self.combined_where(staged.values()))
+
+        self.logger.debug(f'Shared scan of `{scan["table"]}` for {", ".join(d.__name__ for d in staged)}')
+
+        try:
+            for row in lead.sql_table_iter(**scan):
+                matched = {name: row.pop(name) for name, _ in flags.values()}
+
+                for deco_class, deco in list(staged.items()):
+                    if deco_class in flags and not matched[flags[deco_class][0]]:
+                        continue
+
+                    try:
+                        deco.DATA.append(deco.process_row(dict(row)))
+                    except Exception as e:
+                        self.RESULTS[deco_class] = None, e
+
+                        del staged[deco_class]
+        except sqlite3.Error as e:
+            self.logger.warning(f'Shared scan failed, decoding separately: {e}')
+
+            return {}
+
+        for deco_class, deco in staged.items():
+            self.RESULTS[deco_class] = deco, None
+
+        return self.RESULTS
+
+
+def decode_shared(decoders, work_dir, input_file, pool, **kwargs):
+    results = {}
+    groups = collections.defaultdict(list)
+
+    for deco_class in decoders:
+        key = deco_class.scan_key()
+
+        if key:
+            groups[key].append(deco_class)
+
+    for group in groups.values():
+        if len(group) > 1:
+            results.update(SharedScan(group, work_dir, input_file, pool, **kwargs).run())
+
+    for deco_class in decoders:
+        if deco_class not in results:
+            try:
+                results[deco_class] = deco_class(work_dir, input_file, pool=pool), None
+            except Exception as e:
+                results[deco_class] = None, e
+
+        yield (deco_class, *results.pop(deco_class))
+
+
 class DecoderError(Exception):
     pass
@@ -54,6 +54,7 @@ class Config:
         if not os.path.isfile(self.config_file):
             self.initialise()
 
+        self.conf.read_dict(self.default_user_config())
         self.conf.read(self.config_file)
 
     def initialise(self):
@@ -90,6 +91,24 @@ class Config:
                 'last_path': os.path.expanduser('~'),
                 'dict_path': os.path.expanduser('~'),
                 'update_rate': 100000,
+                'decode_workers': 1,
+                'crack_workers': 1,
+                'keep_backup_tar': 0,
+                'overlap_backup': 1,
+                'inflate_buffer': 2**20,
+                'inflate_depth': 8,
+                'decode_cache_mb': 0,
+                'adb_session': 1,
+                'bulk_pull': 1,
+                'transfer_chunk': 2**22,
+                'probe_deadline': 15,
+                'permission_timeout': 120,
+                'adb_async_limit': 4,
+                'adb_path': '',
+                'fake_adb_root': '',
+                'fake_adb_mode': 'root',
+                'fake_adb_latency': 0,
+                'fake_adb_bandwidth': 0,
                 'offline_mode': 0,
                 'window_size': 20,
                 'save_log': 1,
@@ -3,25 +3,167 @@ import itertools
 import struct
 import string
 import binascii
+import os
+import mmap
+import json
 import time
+import logging
+import functools
+import contextlib
+import multiprocessing
+import concurrent.futures
+import config
 import utils
 from dataclasses import dataclass
 
+logger = logging.getLogger(__name__)
 
-def crack_pattern(pat):
+_shared = {}
+_indexes = {}
+
+CURRENT_SIZE = 256
+
+
+@functools.lru_cache(maxsize=4)
+def _product_block(chars, length):
+    return tuple(''.join(t).encode() for t in itertools.product(chars, repeat=length))
+
+
+def _midpoint(a, b, size=3):
+    (r1, c1), (r2, c2) = divmod(a, size), divmod(b, size)
+
+    if not (r1 + r2) % 2 and not (c1 + c2) % 2:
+        return (r1 + r2) // 2 * size + (c1 + c2) // 2
+
+
+MIDPOINTS = [[_midpoint(a, b) if a != b else None for b in range(9)] for a in range(9)]
+
+
+def valid_gestures(min_len=4, max_len=9):
+    def walk(path):
+        if len(path) >= min_len:
+            yield bytes(path)
+
+        if len(path) == max_len:
+            return
+
+        for point in range(9):
+            if point in path:
+                continue
+
+            mid = MIDPOINTS[path[-1]][point]
+
+            if mid is not None and mid not in path:
+                continue
+
+            path.append(point)
+
+            yield from walk(path)
+
+            path.pop()
+
+    for start in range(9):
+        yield from walk([start])
+
+
+class PatternIndex:
+    MAGIC = b'EDPI'
+    VERSION = 1
+    HEAD = struct.Struct('<4sBI')
+    BUCKETS = 2 ** 16
+    RECORD = 9
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+        with open(file_path, 'rb') as R:
+            self.mm = mmap.mmap(R.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.count = self.HEAD.unpack_from(self.mm, 0)
+
+        self.data_offset = self.HEAD.size + (self.BUCKETS + 1) * 4
+
+        if magic != self.MAGIC or version != self.VERSION or \
+                len(self.mm) != self.data_offset + self.count * self.RECORD:
+            self.mm.close()
+
+            raise PasswordCrackError(f'Pattern index is corrupted: {file_path}')
+
+    @staticmethod
+    def pack(pattern):
+        return bytes.fromhex(''.join(f'{p:x}' for p in pattern).ljust(10, 'f'))
+
+    @staticmethod
+    def unpack(data):
+        return [int(p, 16) for p in data.hex().rstrip('f')]
+
+    @classmethod
+    def build(cls, file_path):
+        records = sorted(hashlib.sha1(p).digest()[:4] + cls.pack(p) for p in valid_gestures())
+
+        offsets = [0] * (cls.BUCKETS + 1)
+
+        for rec in records:
+            offsets[int.from_bytes(rec[:2], 'big') + 1] += 1
+
+        for i in range(1, len(offsets)):
+            offsets[i] += offsets[i - 1]
+
+        with open(f'{file_path}.tmp', 'wb') as W:
+            W.write(cls.HEAD.pack(cls.MAGIC, cls.VERSION, len(records)))
+            W.write(struct.pack(f'<{len(offsets)}I', *offsets))
+            W.write(b''.join(records))
+
+        os.replace(f'{file_path}.tmp', file_path)
+
+        logger.info(f'Pattern index built: {file_path} ({len(records):,} gestures)')
+
+    def lookup(self, digest):
+        bucket = int.from_bytes(digest[:2], 'big')
+        lo, hi = struct.unpack_from('<2I', self.mm, self.HEAD.size + bucket * 4)
+
+        for i in range(lo, hi):
+            offset = self.data_offset + i * self.RECORD
+
+            if self.mm[offset:offset + 4] == digest[:4]:
+                pattern = self.unpack(self.mm[offset + 4:offset + self.RECORD])
+
+                if hashlib.sha1(bytes(pattern)).digest() == digest:
+                    return pattern
+
+
+def load_pattern_index(index_dir=None):
+    try:
+        index_dir = index_dir or config.Config().appdirs.user_data_dir
+        file_path = os.path.join(index_dir, 'gesture_patterns.idx')
+
+        if file_path not in _indexes:
+            if not os.path.isfile(file_path):
+                os.makedirs(index_dir, exist_ok=True)
+
+                PatternIndex.build(file_path)
+
+            _indexes[file_path] = PatternIndex(file_path)
+
+        return _indexes[file_path]
+    except (OSError, PasswordCrackError) as e:
+        logger.warning(f'Pattern index unavailable, scanning gestures: {e}')
+
+
+def crack_pattern(pat, index_dir=None):
     patd = binascii.unhexlify(pat.strip())
 
     if patd == hashlib.sha1(b'').digest():
         return
 
-    vals = '\x00\x01\x02\x03\x04\x05\x06\x07\x08'
+    index = load_pattern_index(index_dir)
 
-    for i in range(4, 10):
-        for p in itertools.permutations(vals, i):
-            combo = ''.join(p).encode()
+    if index:
+        return index.lookup(patd) or False
 
-            if hashlib.sha1(combo).digest() == patd:
-                return list(combo)
+    for combo in valid_gestures():
+        if hashlib.sha1(combo).digest() == patd:
+            return list(combo)
 
     return False
 
@@ -39,6 +181,13 @@ class PasswordCrack:
     alpha_range: str = None
     samsung: bool = False
     update_rate: int = 50000
+    workers: int = 1
+    chunks_per_worker: int = 16
+    checkpoint_dir: str = None
+    checkpoint_interval: int = 30
+    dedup: bool = False
+    dedup_limit: int = 2 ** 22
+    dict_chunk: int = 2 ** 20
 
     def __post_init__(self):
         self.key = self.get_hash(self.key)
@@ -70,61 +219,243 @@ class PasswordCrack:
             else binascii.hexlify(struct.pack('>q', salt))
         )
 
-    @staticmethod
-    def int_to_bytes(i):
-        return f'{i}'.encode()
+    def get_engine(self):
+        return HashEngine(self.salt, samsung=self.samsung)
 
-    @staticmethod
-    def make_pin(pin, length):
-        return ''.join(pin).zfill(length).encode()
+    def _feed_dict_batches(self, start, stop, size):
+        if not os.path.getsize(self.dict_file):
+            return
 
-    def _sam_algo(self, pin, times=1024):
-        base = hashlib.sha1(b'0' + pin + self.salt).digest()
+        seen = set()
 
-        for i in map(self.int_to_bytes, range(1, times)):
-            base = hashlib.sha1(base + i + pin + self.salt).digest()
+        with open(self.dict_file, 'rb') as R, \
+                mmap.mmap(R.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = mm.find(b'\n', start - 1) if start else -1
+            pos = len(mm) if start and pos == -1 else pos + 1
+            stop = min(stop, len(mm))
 
-        return base
+            while pos < stop:
+                limit = min(pos + self.dict_chunk, stop)
+                end = mm.find(b'\n', limit - 1)
+                end = len(mm) if end == -1 else end + 1
 
-    def _gen_algo(self, pin):
-        return hashlib.sha1(pin + self.salt).digest()
+                lines = mm[pos:end].split(b'\n')
 
-    def _feed_pins(self):
-        for length in range(4, len(str(self.end)) + 1):
-            for pin in map(
-                lambda x: self.make_pin(x, length),
-                itertools.product(string.digits, repeat=length),
-            ):
-                yield pin
+                if lines[-1] == b'':
+                    lines.pop()
 
-    def _feed_alpha(self):
-        if not self.alpha_range:
-            raise PasswordCrackError('Range of characters not specified')
+                for batch in utils.batched(lines, size):
+                    offset = pos
+                    pos += sum(map(len, batch)) + len(batch)
+                    words = [w.rstrip() for w in batch]
+
+                    if self.dedup:
+                        if len(seen) > self.dedup_limit:
+                            seen.clear()
+
+                        words = [w for w in words if not (w in seen or seen.add(w))]
+
+                    yield offset, words, len(batch)
+
+                pos = end
 
-        for i in range(self.min_len, self.max_len + 1):
-            for prod in itertools.product(self.alpha_range, repeat=i):
-                yield ''.join(prod).encode()
+    def count_words(self):
+        lines = 0
+        last = b'\n'
 
-    def _feed_dict(self):
         with open(self.dict_file, 'rb') as R:
-            for w in R:
-                yield w.rstrip()
+            for chunk in iter(lambda: R.read(self.dict_chunk), b''):
+                lines += chunk.count(b'\n')
+                last = chunk[-1:]
 
-    def _get_feed(self):
+        return lines + (last != b'\n')
+
+    def _spaces(self):
         if not self.alpha:
-            return self._feed_pins()
+            return [(string.digits, i) for i in range(4, len(self.pin_str(self.end)) + 1)]
 
-        elif self.dict_file:
-            return self._feed_dict()
+        if not self.alpha_range:
+            raise PasswordCrackError('Range of characters not specified')
+
+        return [(self.alpha_range, i) for i in range(self.min_len, self.max_len + 1)]
+
+    @staticmethod
+    def index_to_chars(chars, index, length):
+        out = []
+
+        for _ in range(length):
+            index, r = divmod(index, len(chars))
+            out.append(chars[r])
+
+        return ''.join(reversed(out))
+
+    def _product_slice(self, chars, length, lo, hi, block=10 ** 5):
+        tail = 0
+        block = min(block, max(hi - lo, len(chars)))
+
+        while tail < length and len(chars) ** (tail + 1) <= block:
+            tail += 1
+
+        size = len(chars) ** tail
+        tails = _product_block(chars, tail)
 
-        elif self.alpha_range:
-            return self._feed_alpha()
+        for p in range(lo // size, (hi - 1) // size + 1):
+            prefix = self.index_to_chars(chars, p, length - tail).encode()
+            first = max(lo - p * size, 0)
+            last = min(hi - p * size, size)
 
-        raise PasswordCrackError('Attack method was not chosen.')
+            for t in tails[first:last]:
+                yield prefix + t
+
+    def _feed_product_range(self, start, stop):
+        offset = 0
+
+        for chars, length in self._spaces():
+            size = len(chars) ** length
+            lo, hi = max(start - offset, 0), min(stop - offset, size)
+
+            if lo < hi:
+                yield from self._product_slice(chars, length, lo, hi)
+
+            offset += size
+
+            if offset >= stop:
+                break
+
+    def _feed_gaps(self, gaps, size):
+        for index, (start, stop) in enumerate(gaps):
+            for position, batch, count in self._feed_batches(start, stop, size):
+                yield [[position, stop], *gaps[index + 1:]], batch, count
+
+    def _feed_batches(self, start, stop, size):
+        if self.alpha and self.dict_file:
+            yield from self._feed_dict_batches(start, stop, size)
+
+            return
+
+        for batch in utils.batched(self._feed_product_range(start, stop), size):
+            yield start, batch, len(batch)
+
+            start += len(batch)
+
+    def get_total(self, first, end):
+        if self.alpha and self.dict_file:
+            return self.count_words()
+
+        return end - first
+
+    @staticmethod
+    def pin_str(pin):
+        pin = str(pin).strip().zfill(4)
+
+        if not pin.isdigit():
+            raise PasswordCrackError('PIN range must be digits only')
+
+        return pin
+
+    def pin_index(self, pin):
+        pin = self.pin_str(pin)
+
+        return sum(10 ** i for i in range(4, len(pin))) + int(pin)
 
     def get_total_combos(self):
         return sum(len(self.alpha_range) ** i for i in range(self.min_len, self.max_len + 1))
 
+    def get_keyspace(self):
+        if self.alpha and self.dict_file:
+            return os.path.getsize(self.dict_file)
+
+        return sum(len(chars) ** length for chars, length in self._spaces())
+
+    def get_bounds(self):
+        if not self.alpha:
+            first, end = self.pin_index(self.start), self.pin_index(self.end) + 1
+
+            if first >= end:
+                raise PasswordCrackError('PIN start must not be above the max value')
+
+            return first, end
+
+        return 0, self.get_keyspace()
+
+    def partitions(self, gaps):
+        step = max(1, -(-sum(e - s for s, e in gaps) // (self.workers * self.chunks_per_worker)))
+
+        for first, end in gaps:
+            for start in range(first, end, step):
+                yield start, min(start + step, end)
+
+    def job_spec(self):
+        spec = {
+            'key': binascii.hexlify(self.key).decode(),
+            'salt': self.salt.decode(),
+            'samsung': bool(self.samsung),
+            'alpha': bool(self.alpha),
+        }
+
+        if not self.alpha:
+            spec.update(start=self.pin_str(self.start), end=self.pin_str(self.end))
+
+        elif self.dict_file:
+            stat = os.stat(self.dict_file)
+
+            spec.update(dict_file=os.path.abspath(self.dict_file), size=stat.st_size, mtime=int(stat.st_mtime))
+
+        else:
+            spec.update(alpha_range=self.alpha_range, min_len=self.min_len, max_len=self.max_len)
+
+        return spec
+
+    @property
+    def checkpoint_file(self):
+        if self.checkpoint_dir and os.path.isdir(self.checkpoint_dir):
+            job = hashlib.sha1(json.dumps(self.job_spec(), sort_keys=True).encode()).hexdigest()
+
+            return os.path.join(self.checkpoint_dir, f'crack_{job[:16]}.json')
+
+    def load_checkpoint(self, first, end):
+        file_ = self.checkpoint_file
+
+        if file_ and os.path.isfile(file_):
+            with contextlib.suppress(ValueError, KeyError, TypeError, OSError):
+                with open(file_) as R:
+                    data = json.load(R)
+
+                if data['job'] == self.job_spec():
+                    gaps = [[int(s), int(e)] for s, e in data['gaps'] if s < e]
+
+                    logger.info(f'Resuming from checkpoint: {file_}')
+
+                    return gaps, int(data['tried'])
+
+            logger.warning(f'Ignoring invalid checkpoint: {file_}')
+
+            self.clear_checkpoint()
+
+        return [[first, end]], 0
+
+    def save_checkpoint(self, gaps, tried):
+        file_ = self.checkpoint_file
+
+        if not file_:
+            return
+
+        with open(f'{file_}.tmp', 'w') as W:
+            json.dump({
+                'job': self.job_spec(),
+                'gaps': sorted(gaps),
+                'tried': tried,
+                'updated': int(time.time())
+            }, W)
+
+        os.replace(f'{file_}.tmp', file_)
+
+    def clear_checkpoint(self):
+        file_ = self.checkpoint_file
+
+        if file_ and os.path.isfile(file_):
+            os.remove(file_)
+
     @staticmethod
     def set_tried(obj, n):
         if obj:
@@ -140,38 +471,230 @@ class PasswordCrack:
         if obj:
             done_ = n / total * 100
 
-            rem_ = utils.human_time((total - n) // self.rate)
+            rem_ = utils.human_time((total - n) // max(self.rate, 1))
 
             obj.set(f'{done_:,.2f} % \t{rem_} reamining')
 
     def crack_password(self, tk_obj=None, stop=None, tried=None, rate=None, prog=None):
-        algo = self._gen_algo if not self.samsung else self._sam_algo
-        feed = self._get_feed()
+        if self.workers > 1:
+            return self.crack_password_parallel(tk_obj, stop, tried, rate, prog)
+
+        engine = self.get_engine()
+        first, end = self.get_bounds()
+        gaps, done = self.load_checkpoint(first, end)
 
         if prog:
-            self.total = self.get_total_combos()
+            self.total = self.get_total(first, end)
+
+        started = saved = time.time()
 
-        started = time.time()
-        
         n = 0
 
-        for n, pin in enumerate(feed, start=1):
-            if not n % self.update_rate and tk_obj:
+        for remaining, batch, size in self._feed_gaps(gaps, self.update_rate):
+            if n:
                 self.set_rate(rate, n, started)
-                self.set_tried(tried, n)
-                self.set_prog(prog, n, self.total)
+                self.set_tried(tried, done + n)
+                self.set_prog(prog, done + n, self.total)
 
-                tk_obj.set(pin.decode())
+                if tk_obj and batch:
+                    tk_obj.set(batch[0].decode())
 
                 if stop and stop.get():
+                    self.save_checkpoint(remaining, done + n)
+
                     break
 
-            if algo(pin) == self.key:
-                self.set_tried(tried, n)
+                if time.time() - saved > self.checkpoint_interval:
+                    self.save_checkpoint(remaining, done + n)
+
+                    saved = time.time()
+
+            hit = engine.search(batch, self.key)
+
+            if hit is not None:
+                self.set_tried(tried, done + n + hit + 1)
+                self.clear_checkpoint()
+
+                return batch[hit].decode()
+
+            n += size
+
+        else:
+            self.clear_checkpoint()
+
+        self.set_tried(tried, done + n)
+
+    def crack_password_parallel(self, tk_obj=None, stop=None, tried=None, rate=None, prog=None, poll=0.5):
+        first, end = self.get_bounds()
+        gaps, done = self.load_checkpoint(first, end)
+        parts = list(self.partitions(gaps))
+
+        found = multiprocessing.Event()
+        counter = multiprocessing.Value('q', 0)
+        current = multiprocessing.Array('c', CURRENT_SIZE)
+        progress = multiprocessing.Array('q', [start for start, _ in parts], lock=False)
+
+        def remaining():
+            with counter.get_lock():
+                return counter.value, [[progress[i], e] for i, (_, e) in enumerate(parts) if progress[i] < e]
+
+        if prog:
+            self.total = self.get_total(first, end)
+
+        started = saved = time.time()
+        result = None
+
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(found, counter, current, progress)
+            ) as executor:
+            pending = {executor.submit(_crack_range, self, i, start, stop_) for i, (start, stop_) in enumerate(parts)}
+
+            try:
+                while pending:
+                    completed, pending = concurrent.futures.wait(
+                        pending,
+                        timeout=poll,
+                        return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+
+                    for future in completed:
+                        result = result or future.result()
+
+                    n, gaps = remaining()
+
+                    if n:
+                        self.set_rate(rate, n, started)
+                        self.set_tried(tried, done + n)
+                        self.set_prog(prog, done + n, self.total)
+
+                        if tk_obj and current.value:
+                            tk_obj.set(current.value.decode(errors='replace'))
+
+                    if result:
+                        break
+
+                    if stop and stop.get():
+                        self.save_checkpoint(gaps, done + n)
+
+                        break
+
+                    if time.time() - saved > self.checkpoint_interval:
+                        self.save_checkpoint(gaps, done + n)
+
+                        saved = time.time()
+
+                else:
+                    self.clear_checkpoint()
+
+                if result:
+                    self.clear_checkpoint()
+
+            finally:
+                found.set()
+
+                for future in pending:
+                    future.cancel()
+
+        self.set_tried(tried, done + counter.value)
+
+        return result
+
+
+def _init_worker(found, counter, current, progress):
+    _shared['found'] = found
+    _shared['counter'] = counter
+    _shared['current'] = current
+    _shared['progress'] = progress
+
+
+def _advance(index, position, count):
+    counter = _shared['counter']
+
+    with counter.get_lock():
+        counter.value += count
+        _shared['progress'][index] = position
+
+
+def _crack_range(crack, index, start, stop):
+    found, current = _shared['found'], _shared['current']
+
+    engine = crack.get_engine()
+
+    size = 0
+
+    for position, batch, count in crack._feed_batches(start, stop, crack.update_rate):
+        _advance(index, position, size)
+
+        if found.is_set():
+            return None
+
+        if batch:
+            current.value = batch[0][:CURRENT_SIZE - 1]
+
+        hit = engine.search(batch, crack.key)
+
+        if hit is not None:
+            found.set()
+
+            _advance(index, position, hit + 1)
+
+            return batch[hit].decode()
+
+        size = count
+
+    _advance(index, stop, size)
+
+
+class HashEngine:
+    SMALL_BATCH = 256
+
+    def __init__(self, salt, samsung=False, rounds=1024):
+        self.salt = salt
+        self.samsung = samsung
+        self.counters = tuple(f'{i}'.encode() for i in range(1, rounds))
+
+    def digest(self, pin):
+        if self.samsung:
+            return self._samsung(pin)
+
+        return hashlib.sha1(pin + self.salt).digest()
+
+    def _samsung(self, pin):
+        sha1 = hashlib.sha1
+        tail = pin + self.salt
+        base = sha1(b'0' + tail).digest()
+
+        for counter in self.counters:
+            h = sha1(base)
+            h.update(counter)
+            h.update(tail)
+            base = h.digest()
+
+        return base
+
+    def search(self, pins, key):
+        if self.samsung:
+            for n, pin in enumerate(pins):
+                if self._samsung(pin) == key:
+                    return n
+
+            return None
+
+        sha1, salt = hashlib.sha1, self.salt
+
+        if len(pins) < self.SMALL_BATCH:
+            for n, pin in enumerate(pins):
+                if sha1(pin + salt).digest() == key:
+                    return n
+
+            return None
 
-                return pin.decode()
+        digests = [sha1(pin + salt).digest() for pin in pins]
 
-        self.set_tried(tried, n)
+        if key in digests:
+            return digests.index(key)
 
 
 class PasswordCrackError(Exception):
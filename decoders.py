@@ -13,6 +13,7 @@ class SettingsDecoder(AndroidDecoder):
     TARGET = 'settings.db'
     NAMESPACE = 'db'
     PACKAGE = 'com.android.providers.settings'
+    version = 1
     exclude_from_menus = True
 
     def main(self):
@@ -38,6 +39,7 @@ class SettingsDecoder(AndroidDecoder):
 
 class LocksettingsDecoder(AndroidDecoder):
     TARGET = 'locksettings.db'
+    version = 1
     target_is_db = True
     exclude_from_menus = True
 
@@ -52,6 +54,7 @@ class LocksettingsDecoder(AndroidDecoder):
 
 class AccountsDecoder(AndroidDecoder):
     TARGET = 'accounts.db'
+    version = 1
     target_is_db = True
     template_name = 'accounts.html'
     title = 'Accounts (System)'
@@ -73,6 +76,7 @@ class AccountsDecoder(AndroidDecoder):
 
 class WifiPasswordsDecoder(AndroidDecoder):
     TARGET = 'wpa_supplicant.conf'
+    version = 1
     template_name = 'wifi_passwords.html'
     title = 'Wi-Fi Passwords'
     headers = {
@@ -105,6 +109,7 @@ class WifiPasswordsDecoder(AndroidDecoder):
 
 class WifiPasswordsAbDecoder(WifiPasswordsDecoder):
     TARGET = 'flattened-data'
+    version = 1
     exclude_from_menus = True
 
 
@@ -112,6 +117,7 @@ class WebViewDecoder(AndroidDecoder):
     TARGET = 'webview.db'
     NAMESPACE = 'db'
     PACKAGE = 'com.android.browser'
+    version = 1
     template_name = 'web_passwords.html'
     title = 'WebView Browser Passwords'
     headers = {
@@ -129,6 +135,7 @@ class BrowserHistoryDecoder(AndroidDecoder):
     TARGET = 'browser2.db'
     NAMESPACE = 'db'
     PACKAGE = 'com.android.browser'
+    version = 1
     template_name = 'web_history.html'
     title = 'Android Browser History'
     headers = {
@@ -143,7 +150,7 @@ class BrowserHistoryDecoder(AndroidDecoder):
         table = 'history'
         kw = {'order_by': 'date'}
 
-        for i in self.sql_table_as_dict(table, **kw):
+        for i in self.sql_table_iter(table, **kw):
             i['date'] = self.unix_to_time_ms(i['date'])
 
             self.DATA.append(i)
@@ -153,13 +160,14 @@ class ChromeHistoryDecoder(BrowserHistoryDecoder):
     TARGET = 'History'
     NAMESPACE = 'app_chrome/Default'
     PACKAGE = 'com.android.chrome'
+    version = 1
     target_is_db = True
     title = 'Google Chrome History'
 
     def main(self):
         table = 'urls'
 
-        for i in self.sql_table_as_dict(table, order_by='last_visit_time'):
+        for i in self.sql_table_iter(table, order_by='last_visit_time'):
             i['date'] = self.webkit_to_time(i['last_visit_time'])
             i['visits'] = i['visit_count']
 
@@ -170,6 +178,7 @@ class ChromePasswordsDecoder(AndroidDecoder):
     TARGET = 'Login Data'
     NAMESPACE = 'app_chrome/Default'
     PACKAGE = 'com.android.chrome'
+    version = 1
     target_is_db = True
     template_name = 'chrome_passwords.html'
     title = 'Google Chrome Passwords'
@@ -193,6 +202,7 @@ class ChromePasswordsDecoder(AndroidDecoder):
 
 class ChromeArchivedHistoryDecoder(ChromeHistoryDecoder):
     TARGET = 'Archived History'
+    version = 1
     exclude_from_menus = True
     title = 'Google Chrome Archived History'
 
@@ -201,6 +211,7 @@ class GenericCallsDecoder(AndroidDecoder):
     TARGET = 'contacts2.db'
     NAMESPACE = 'db'
     PACKAGE = 'com.android.providers.contacts'
+    version = 1
     template_name = 'call_logs.html'
     title = 'Call Logs'
     headers = {
@@ -211,43 +222,31 @@ class GenericCallsDecoder(AndroidDecoder):
         'date': 'Time',
         'duration': 'Duration'
     }
+    SCAN = {'table': 'calls', 'order_by': 'date'}
 
-    def main(self):
-        table = 'calls'
+    def process_row(self, i):
+        i['type'] = self.call_type(i['type'])
+        i['number'] = self.parse_number(i['number'])
+        i['date'] = self.unix_to_time_ms(i['date'])
+        i['duration'] = self.duration(i['duration'])
 
-        for i in self.sql_table_as_dict(table, order_by='date'):
-            i['type'] = self.call_type(i['type'])
-            i['number'] = self.parse_number(i['number'])
-            i['date'] = self.unix_to_time_ms(i['date'])
-            i['duration'] = self.duration(i['duration'])
-
-            self.DATA.append(i)
+        return i
 
 
 class SamsungCallsDecoder(GenericCallsDecoder):
     TARGET = 'logs.db'
     NAMESPACE = 'db'
     PACKAGE = 'com.sec.android.provider.logsprovider'
+    version = 1
     title = 'Samsung Call Logs'
-
-    def main(self):
-        table = 'logs'
-
-        kw = {'order_by': 'date', 'where': {'logtype': 100}}
-
-        for i in self.sql_table_as_dict(table, **kw):
-            i['type'] = self.call_type(i['type'])
-            i['number'] = self.parse_number(i['number'])
-            i['date'] = self.unix_to_time_ms(i['date'])
-            i['duration'] = self.duration(i['duration'])
-
-            self.DATA.append(i)
+    SCAN = {'table': 'logs', 'order_by': 'date', 'where': {'logtype': 100}}
 
 
 class AndroidOneCallsDecoder(GenericCallsDecoder):
     TARGET = 'calllog.db'
     NAMESPACE = 'db'
     PACKAGE = 'com.android.providers.contacts'
+    version = 1
     title = 'Android One Call Logs'
 
 
@@ -255,6 +254,7 @@ class SamsungSnippetsDecoder(AndroidDecoder):
     TARGET = 'logs.db'
     NAMESPACE = 'db'
     PACKAGE = 'com.sec.android.provider.logsprovider'
+    version = 1
     template_name = 'samsung_snippets.html'
     title = 'Samsung SMS Snippets'
     headers = {
@@ -265,24 +265,21 @@ class SamsungSnippetsDecoder(AndroidDecoder):
         'type': 'Type',
         'date': 'Time'
     }
+    SCAN = {'table': 'logs', 'order_by': 'date', 'where': {'logtype': 300}}
 
-    def main(self):
-        table = 'logs'
-
-        kw = {'order_by': 'date', 'where': {'logtype': 300}}
-
-        for i in self.sql_table_as_dict(table, **kw):
-            i['type'] = self.sms_type(i['type'])
-            i['number'] = self.parse_number(i['number'])
-            i['date'] = self.unix_to_time_ms(i['date'])
+    def process_row(self, i):
+        i['type'] = self.sms_type(i['type'])
+        i['number'] = self.parse_number(i['number'])
+        i['date'] = self.unix_to_time_ms(i['date'])
 
-            self.DATA.append(i)
+        return i
 
 
 class SMSMMSDecoder(AndroidDecoder):
     TARGET = 'mmssms.db'
     NAMESPACE = 'db'
     PACKAGE = 'com.android.providers.telephony'
+    version = 1
     template_name = 'sms_messages.html'
     title = 'SMS Messages'
     headers = {
@@ -296,7 +293,7 @@ class SMSMMSDecoder(AndroidDecoder):
     def main(self):
         table = 'sms'
 
-        for i in self.sql_table_as_dict(table, order_by='date'):
+        for i in self.sql_table_iter(table, order_by='date'):
             i['address'] = self.parse_number(i['address'])
             i['date'] = self.unix_to_time_ms(i['date'])
             i['type'] = self.sms_type(i['type'])
@@ -308,6 +305,7 @@ class WhatsAppContactsDecoder(AndroidDecoder):
     TARGET = 'wa.db'
     NAMESPACE = 'db'
     PACKAGE = 'com.whatsapp'
+    version = 1
     template_name = 'whatsapp_contacts.html'
     title = 'WhatsApp Contacts'
     headers = {
@@ -336,7 +334,9 @@ class WhatsAppCallsDecoder(GenericCallsDecoder):
     TARGET = 'msgstore.db'
     NAMESPACE = 'db'
     PACKAGE = 'com.whatsapp'
+    version = 1
     title = 'WhatsApp Calls'
+    SCAN = {'table': 'messages', 'order_by': 'timestamp', 'where': {'media_wa_type': 8}}
 
     @staticmethod
     def num(jid):
@@ -355,23 +355,21 @@ class WhatsAppCallsDecoder(GenericCallsDecoder):
 
         return 'Unknown'
 
-    def main(self):
-        table = 'messages'
-        kw = {'where': {'media_wa_type': 8}, 'order_by': 'timestamp'}
-
-        for i in self.sql_table_as_dict(table, **kw):
-            i['number'] = self.num(i['key_remote_jid'])
-            i['date'] = self.unix_to_time_ms(i['timestamp'])
-            i['type'] = self.call_type(i['key_from_me'], i['media_duration'])
-            i['duration'] = self.duration(i['media_duration'])
+    def process_row(self, i):
+        i['number'] = self.num(i['key_remote_jid'])
+        i['date'] = self.unix_to_time_ms(i['timestamp'])
+        i['type'] = self.call_type(i['key_from_me'], i['media_duration'])
+        i['duration'] = self.duration(i['media_duration'])
 
-            self.DATA.append(i)
+        return i
 
 
 class WhatsAppMessagesDecoder(AndroidDecoder):
     TARGET = 'msgstore.db'
     NAMESPACE = 'db'
     PACKAGE = 'com.whatsapp'
+    EXTRAS = [('sp', 'com.whatsapp_preferences.xml'), ('f', 'key')]
+    version = 1
     template_name = 'whatsapp_messages.html'
     title = 'WhatsApp Messages'
     headers = {
@@ -382,12 +380,7 @@ class WhatsAppMessagesDecoder(AndroidDecoder):
         'type': 'Type',
         'timestamp': 'Time'
     }
-
-    def __init__(self, work_dir, input_file, **kwargs):
-        super().__init__(work_dir, input_file, **kwargs)
-
-        self.add_extra('sp', 'com.whatsapp_preferences.xml')
-        self.add_extra('f', 'key')
+    SCAN = {'table': 'messages', 'order_by': 'timestamp', 'where': {'!status': [6, -1]}}
 
     @staticmethod
     def num(jid):
@@ -466,42 +459,40 @@ class WhatsAppMessagesDecoder(AndroidDecoder):
         for d in self.sql_table_as_dict('message_thumbnails'):
             self.thumbs[d['key_id']] = d['thumbnail']
 
-    def main(self):
+    def prepare(self):
         self.populate_chats()
         self.populate_owner()
         self.populate_parts()
         self.populate_broadcast()
 
-        table = 'messages'
-
-        kw = {'where': {'!status': [6, -1]}, 'order_by': 'timestamp'}
-
-        for i in self.sql_table_as_dict(table, **kw):
-            i['sender'] = self.get_sender(i)
-            i['recipients'] = self.get_recipients(i)
-            i['x_recipients'] = '\n'.join(i['recipients'])
-            i['x_message'] = f'{i["data"] or ""}'
-            i['timestamp'] = self.unix_to_time_ms(i['timestamp'])
-            i['type'] = 'Sent' if i['key_from_me'] else 'Inbox'
-            i['raw_data'] = self.encode_raw_data(i)
+    def process_row(self, i):
+        i['sender'] = self.get_sender(i)
+        i['recipients'] = self.get_recipients(i)
+        i['x_recipients'] = '\n'.join(i['recipients'])
+        i['x_message'] = f'{i["data"] or ""}'
+        i['timestamp'] = self.unix_to_time_ms(i['timestamp'])
+        i['type'] = 'Sent' if i['key_from_me'] else 'Inbox'
+        i['raw_data'] = self.encode_raw_data(i)
 
-            data_obj = self.get_javaobj(i)
+        data_obj = self.get_javaobj(i)
 
-            if hasattr(data_obj, 'file') and hasattr(data_obj.file, 'path'):
-                i['file_path'] = data_obj.file.path
+        if hasattr(data_obj, 'file') and hasattr(data_obj.file, 'path'):
+            i['file_path'] = data_obj.file.path
 
-            if hasattr(data_obj, 'fileSize') and data_obj.fileSize:
-                i['file_size'] = utils.human_bytes(data_obj.fileSize)
+        if hasattr(data_obj, 'fileSize') and data_obj.fileSize:
+            i['file_size'] = utils.human_bytes(data_obj.fileSize)
 
-            i['chat'] = self.chats.get(i['key_remote_jid'], self.key_jid(i))
+        i['chat'] = self.chats.get(i['key_remote_jid'], self.key_jid(i))
 
-            self.DATA.append(i)
+        return i
 
 
 class FacebookMessagesDecoder(AndroidDecoder):
     TARGET = 'threads_db2'
     NAMESPACE = 'db'
     PACKAGE = 'com.facebook.orca'
+    EXTRAS = [('db', 'stickers_db'), ('db', 'stickers_db-journal')]
+    version = 1
     target_is_db = True
     template_name = 'facebook_messages.html'
     title = 'Facebook Messenger'
@@ -522,9 +513,6 @@ class FacebookMessagesDecoder(AndroidDecoder):
 
         super().__init__(work_dir, input_file, **kwargs)
 
-        self.add_extra('db', 'stickers_db')
-        self.add_extra('db', 'stickers_db-journal')
-
     def process_users(self):
         def user_info(d):
             if not d.get('profile_pic_square'):
@@ -572,7 +560,7 @@ class FacebookMessagesDecoder(AndroidDecoder):
         stickers_db = self.get_neighbour('stickers_db')
 
         if stickers_db:
-            dec = AndroidDecoder(None, stickers_db, stage=True)
+            dec = AndroidDecoder(None, stickers_db, stage=True, pool=self.pool)
 
             for k, v in dec.sql_table_rows('stickers', columns=['id', 'uri']):
                 self.stickers[k] = v
@@ -616,7 +604,7 @@ class FacebookMessagesDecoder(AndroidDecoder):
         table = 'messages'
         kw = {'where': {'msg_type': [0, 9]}, 'order_by': 'timestamp_ms'}
 
-        for i in self.sql_table_as_dict(table, **kw):
+        for i in self.sql_table_iter(table, **kw):
             sender = json.loads(i['sender'])
             i['sender'] = sender['name']
             i['user_key'] = sender['user_key']
@@ -636,6 +624,7 @@ class FacebookMessagesDecoder(AndroidDecoder):
 class FacebookMessagesLiteDecoder(FacebookMessagesDecoder):
     TARGET = 'core.db'
     PACKAGE = 'com.facebook.mlite'
+    version = 1
     title = 'Facebook Messenger Lite'
 
     @staticmethod
@@ -673,7 +662,7 @@ class FacebookMessagesLiteDecoder(FacebookMessagesDecoder):
 
         table = 'messages'
 
-        for i in self.sql_table_as_dict(table, order_by='timestamp'):
+        for i in self.sql_table_iter(table, order_by='timestamp'):
             i['sender_info'] = self.users.get(i['user_id'], {})
             i['text'] = i['snippet']
             i['recipients'] = self.get_recipients(i)
@@ -686,6 +675,7 @@ class ViberMessagesDecoder(AndroidDecoder):
     TARGET = 'viber_messages'
     NAMESPACE = 'db'
     PACKAGE = 'com.viber.voip'
+    version = 1
     target_is_db = True
     template_name = 'viber_messages.html'
     title = 'Viber Messages'
@@ -749,7 +739,7 @@ class ViberMessagesDecoder(AndroidDecoder):
 
         kw = {'where': {'!token': 1}, 'order_by': 'msg_date'}
 
-        for i in self.sql_table_as_dict(table, **kw):
+        for i in self.sql_table_iter(table, **kw):
             i['sender'] = self.get_part(i)
             i['x_sender'] = f'{i["sender"].get("number", "")} ({i["sender"].get("name", "")})'
             i['recipients'] = self.get_convo(i)
@@ -769,6 +759,7 @@ class ViberContactsDecoder(AndroidDecoder):
     TARGET = 'viber_data'
     NAMESPACE = 'db'
     PACKAGE = 'com.viber.voip'
+    version = 1
     target_is_db = True
     template_name = 'viber_contacts.html'
     title = 'Viber Contacts'
@@ -806,30 +797,27 @@ class ViberCallsDecoder(GenericCallsDecoder):
     TARGET = 'viber_data'
     NAMESPACE = 'db'
     PACKAGE = 'com.viber.voip'
+    version = 1
     target_is_db = True
     title = 'Viber Calls'
 
-    def main(self):
-        table = 'calls'
-
-        kw = {'order_by': 'date'}
-
-        for i in self.sql_table_as_dict(table, **kw):
-            i['type'] = self.call_type(i['type'])
+    def process_row(self, i):
+        i['type'] = self.call_type(i['type'])
 
-            if i['viber_call_type'] == 4:
-                i['type'] += ' (Video)'
+        if i['viber_call_type'] == 4:
+            i['type'] += ' (Video)'
 
-            i['date'] = self.unix_to_time_ms(i['date'])
-            i['duration'] = self.duration(i['duration'])
+        i['date'] = self.unix_to_time_ms(i['date'])
+        i['duration'] = self.duration(i['duration'])
 
-            self.DATA.append(i)
+        return i
 
 
 class DownloadsDecoder(AndroidDecoder):
     TARGET = 'downloads.db'
     NAMESPACE = 'db'
     PACKAGE = 'com.android.providers.downloads'
+    version = 1
     template_name = 'downloads.html'
     title = 'Download History'
     headers = {
@@ -859,6 +847,7 @@ class AndroidCalendarDecoder(AndroidDecoder):
     TARGET = 'calendar.db'
     NAMESPACE = 'db'
     PACKAGE = 'com.android.providers.calendar'
+    version = 1
     template_name = 'calendar.html'
     title = 'Android Calendar'
     headers = {
@@ -902,6 +891,7 @@ class GooglePhotosDecoder(AndroidDecoder):
     RETARGET = 'gphotos*.db'
     NAMESPACE = 'db'
     PACKAGE = 'com.google.android.apps.photos'
+    version = 1
     template_name = 'google_photos.html'
     title = 'Google Photos'
     headers = {
@@ -958,6 +948,7 @@ class GooglePhotosDecoder(AndroidDecoder):
 
 class SharedFilesystemDecoder(AndroidDecoder):
     RETARGET = '*.ab'
+    version = 1
     exclude_from_menus = True
     exclude_from_registry = True
     exp_match = r'^shared/\d/'
@@ -974,18 +965,14 @@ class SharedFilesystemDecoder(AndroidDecoder):
     def __init__(self, work_dir, input_file, **kwargs):
         self.tools = utils.DetectiveTools()
         self.match = kwargs.get('match', self.exp_match)
+        self.password = kwargs.get('password')
 
         super().__init__(work_dir, input_file, **kwargs)
 
-    def process_ab(self):
-        self.tar_file = self.tools.ab_to_tar(self.input_file)
-
     def main(self):
-        self.process_ab()
-
-        args = self.tar_file, self.work_dir
+        args = self.input_file, self.work_dir
 
-        for member in self.tools.extract_tar_members(*args, match=self.match):
+        for member in self.tools.extract_ab_members(*args, match=self.match, password=self.password):
             if not member.isfile() or not member.size:
                 continue
 
@@ -1,16 +1,26 @@
+import asyncio
 import threading
 import shutil
 import os
+import io
+import hashlib
 import re
+import copy
+import json
 import tarfile
 import tempfile
 import pathlib
 import webbrowser
 import time
 import logging
+import traceback
+import concurrent.futures
+import cache
+import config
 import utils
 import engines
 import messages
+import classes
 import decoders
 import adb_connection
 from contextlib import suppress
@@ -18,11 +28,41 @@ from contextlib import suppress
 logger = logging.getLogger(__name__)
 
 
+def decode_file(work_dir, file_path, deco_classes, use_cache=True):
+    results = {}
+
+    with cache.DecodeCache(enabled=use_cache) as store:
+        digest = store.file_digest(file_path)
+        keys = {deco_class: store.key(digest, deco_class, file_path) for deco_class in deco_classes}
+
+        for deco_class in deco_classes:
+            DATA = store.get(keys[deco_class])
+
+            if DATA is not None:
+                logger.debug(f'cache:hit:{deco_class.__name__}')
+
+                results[deco_class] = DATA, None
+
+        pending = [d for d in deco_classes if d not in results]
+
+        with classes.ConnectionPool() as pool:
+            for deco_class, deco, error in classes.decode_shared(pending, work_dir, file_path, pool):
+                if error:
+                    error = ''.join(traceback.format_exception(type(error), error, error.__traceback__))
+                else:
+                    store.put(keys[deco_class], deco.DATA)
+
+                results[deco_class] = deco.DATA if deco else None, error
+
+    return [(deco_class, *results[deco_class]) for deco_class in deco_classes]
+
+
 class ChainExecution:
     USER = 'shell'
     ROOT = 'root'
     ROOTSU = 'root-su'
     DATA_STORE = 'DataStore.tar'
+    MANIFEST = 'manifest.json'
     extract_dir = 'data'
 
     def __init__(self, base_dir, status_msg=None, use_adb=False, **kwargs):
@@ -30,9 +70,11 @@ class ChainExecution:
         self.base_dir = base_dir
         self.work_dir = None
         self.updater = status_msg
+        self.progress = kwargs.get('progress')
+        self.serial = kwargs.get('serial')
 
         if use_adb:
-            self.adb = adb_connection.ADBConnection()
+            self.adb = kwargs.get('adb') or adb_connection.ADBConnection(serial=self.serial)
 
         self.registry = decoders.Registry()
         self.targets = None
@@ -42,9 +84,27 @@ class ChainExecution:
         self.DataStore = None
         self.do_shared = kwargs.get('do_shared', False)
         self.backup = kwargs.get('backup')
+        self.backup_extracted = False
         self.tarfile = kwargs.get('tarfile')
         self.src_dir = kwargs.get('src_dir')
+        self.password = kwargs.get('password')
+        self.use_cache = kwargs.get('use_cache', True)
+        self.incremental = kwargs.get('incremental', False)
+        self.previous = kwargs.get('previous')
+        self.remote_stats = {}
+        self.manifest = {}
         self.WB = None
+        conf = config.Config()
+        self.workers = kwargs.get('workers') or int(conf('decode_workers'))
+        self.keep_tar = kwargs.get('keep_tar', bool(int(conf('keep_backup_tar'))))
+        self.bulk = kwargs.get('bulk', bool(int(conf('bulk_pull'))))
+        self.probe_deadline = kwargs.get('probe_deadline') or float(conf('probe_deadline'))
+        self.permission_timeout = kwargs.get('permission_timeout') or float(conf('permission_timeout'))
+        self.overlap = kwargs.get('overlap', bool(int(conf('overlap_backup'))))
+        self.inflate = {
+            'buffer': kwargs.get('inflate_buffer') or int(conf('inflate_buffer')),
+            'depth': kwargs.get('inflate_depth') or int(conf('inflate_depth'))
+        }
         self.logger = kwargs.get('logger', logger)
 
     def setup(self):
@@ -72,6 +132,9 @@ class ChainExecution:
         self.update('Finished.')
 
     def update(self, msg, info=True):
+        if self.progress:
+            self.progress(msg)
+
         if self.updater:
             self.updater.set(msg)
             self.updater._root.update()
@@ -79,47 +142,45 @@ class ChainExecution:
     def InitialAdbRead(self):
         self.update('Reading information...')
 
-        def get_permission():
+        asyncio.run(self.probe_device())
+
+    async def probe_device(self):
+        deadline = time.monotonic() + self.probe_deadline
+        permission_deadline = time.monotonic() + self.permission_timeout
+
+        def remaining(until=None):
+            return max(0.1, (until or deadline) - time.monotonic())
+
+        async def shell(cmd, su=False):
+            return await aadb.adb_out(cmd, su=su, timeout=remaining())
+
+        async def get_permission():
             self.su = False
 
-            if self.ROOT in self.adb.adb_out('id'):
+            if self.ROOT in await aadb.adb_out('id', timeout=remaining(permission_deadline)):
                 self.permisson = self.ROOT
 
-                return self.permisson
+                return {'permisson': self.permisson}
 
-            if self.ROOT in self.adb.adb_out('id', su=True):
+            if self.ROOT in await aadb.adb_out('id', su=True, timeout=remaining(permission_deadline)):
                 self.permisson = self.ROOTSU
                 self.su = True
 
             else:
                 self.permisson = self.USER
 
-            return self.permisson
+            return {'permisson': self.permisson}
 
         def get_prop(prop, key):
             for row in prop:
                 if key in row:
                     return row.strip().split('=')[1]
 
-        def get_wifi(dump):
-            dump = list(filter(lambda x: x.startswith('mWifiInfo'), dump))
-
-            if dump:
-                src = re.search(r'MAC: ([:0-9a-f]{17}),', dump[0])
-
-                if src:
-                    return src.groups()[0]
-
-        def get_accounts(dump):
-            accs = re.findall(r'Account \{name=(.+?), type=(.+?)\}', dump, re.S)
-
-            return [(v, k) for k, v in accs]
+        async def get_device():
+            return dict(zip(['serial', 'status'], await aadb.device()))
 
-        self.REPORT['serial'], self.REPORT['status'] = self.adb.device()
-        self.REPORT['permisson'] = get_permission()
-
-        with suppress(TimeoutError):
-            build_prop = self.adb.adb_out('cat /system/build.prop', su=self.su, timeout=5)
+        async def get_build():
+            build_prop = await shell('cat /system/build.prop', su=self.su)
 
             if build_prop:
                 build_prop = build_prop.split('\n')
@@ -130,32 +191,35 @@ class ChainExecution:
                     'ro.build.display.id'
                 ]
 
-                for p in props:
-                    self.REPORT[p] = get_prop(build_prop, p)
+                return {p: get_prop(build_prop, p) for p in props}
+
+        async def get_wifi():
+            dump = await shell('dumpsys wifi')
+            dump = list(filter(lambda x: x.startswith('mWifiInfo'), (dump or '').split('\n')))
 
-        with suppress(TimeoutError):
-            _wifi = self.adb.adb_out('dumpsys wifi', timeout=5)
+            if dump:
+                src = re.search(r'MAC: ([:0-9a-f]{17}),', dump[0])
 
-            if _wifi:
-                self.REPORT['wifi mac'] = get_wifi(_wifi.split('\n'))
+                if src:
+                    return {'wifi mac': src.groups()[0]}
 
-        with suppress(TimeoutError):
-            _usbinfo = self.adb.adb_out('dumpsys iphonesubinfo', timeout=5)
+        async def get_imei():
+            _usbinfo = await shell('dumpsys iphonesubinfo')
 
             if _usbinfo:
-                self.REPORT['imei'] = get_prop(_usbinfo.split('\n'), 'Device ID')
+                return {'imei': get_prop(_usbinfo.split('\n'), 'Device ID')}
 
-        with suppress(TimeoutError):
-            self.REPORT['local_time'] = time.strftime('%Y-%m-%d %H:%M:%S %Z')
+        async def get_time():
+            local_time = time.strftime('%Y-%m-%d %H:%M:%S %Z')
 
-            rtime = self.adb.adb_out(r'date "+%F\ %T\ %Z"', timeout=5)
+            rtime = await shell(r'date "+%F\ %T\ %Z"')
             rtime = rtime.replace('\\', '')
 
-            self.REPORT['device_time'] = rtime.split(self.adb.rmr.decode())[-1]
+            return {'local_time': local_time, 'device_time': rtime.split(self.adb.rmr.decode())[-1]}
 
-        with suppress(TimeoutError, Exception):
-            if self.adb.exists('/data/system/SimCard.dat', su=self.su):
-                _simdat = self.adb.adb_out('cat /data/system/SimCard.dat', su=self.su, timeout=5)
+        async def get_sim():
+            if await aadb.exists('/data/system/SimCard.dat', su=self.su):
+                _simdat = await shell('cat /data/system/SimCard.dat', su=self.su)
 
                 sims = [
                     'CurrentSimSerialNumber',
@@ -168,13 +232,98 @@ class ChainExecution:
                 if _simdat:
                     _simdat = _simdat.split('\n')
 
-                    for s in sims:
-                        self.REPORT[s] = get_prop(_simdat, s)
+                    return {s: get_prop(_simdat, s) for s in sims}
+
+        async def get_accounts():
+            accs = re.findall(r'Account \{name=(.+?), type=(.+?)\}', await shell('dumpsys account'), re.S)
+
+            return {'accounts': [(v, k) for k, v in accs]}
+
+        probes = [get_device, get_permission, get_build, get_wifi, get_imei, get_time, get_sim, get_accounts]
+        after_permission = [get_build, get_sim]
+        results = {}
+
+        self.su = False
+        self.permisson = self.USER
+
+        aadb = adb_connection.AsyncADBConnection(self.adb, limit=len(probes))
+
+        pending = {asyncio.create_task(f()): f for f in probes if f not in after_permission}
+
+        try:
+
+            while pending:
+                waiting_permission = get_permission in pending.values()
+
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=max(0, (permission_deadline if waiting_permission else deadline) - time.monotonic()),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done and waiting_permission:
+                    self.logger.error(f'Could not determine device permission (timed out), assuming {self.USER}.')
+
+                    results[get_permission] = {'permisson': self.permisson}
+
+                    for task in [t for t, p in pending.items() if p is get_permission]:
+                        task.cancel()
+
+                        pending.pop(task)
+
+                    deadline = max(deadline, time.monotonic() + self.probe_deadline)
+
+                    pending.update({asyncio.create_task(f()): f for f in after_permission})
 
-        with suppress(TimeoutError):
-            _acc = self.adb.adb_out('dumpsys account', timeout=5)
+                    continue
 
-            self.REPORT['accounts'] = get_accounts(_acc)
+                if not done:
+                    self.logger.warning(f'Device probes timed out: {", ".join(f.__name__ for f in pending.values())}')
+
+                    break
+
+                for future in done:
+                    probe = pending.pop(future)
+
+                    try:
+                        results[probe] = future.result() or {}
+
+                    except Exception as e:
+                        if probe is get_permission:
+                            self.logger.error(f'Could not determine device permission ({e!r}), assuming {self.USER}.')
+
+                            self.su = False
+                            self.permisson = self.USER
+
+                            results[probe] = {'permisson': self.permisson}
+
+                        else:
+                            self.logger.debug(f'{probe.__name__}: {e!r}')
+
+                            results[probe] = {}
+
+                    self.REPORT.update(results[probe])
+
+                    # The deadline restarts once permission is known, so a slow su probe
+                    # can stretch the triage to permission time plus probe_deadline.
+                    if probe is get_permission:
+                        deadline = max(deadline, time.monotonic() + self.probe_deadline)
+
+                        pending.update({asyncio.create_task(f()): f for f in after_permission})
+
+        finally:
+            for task in pending:
+                task.cancel()
+
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        ordered = {}
+
+        for probe in probes:
+            ordered.update(results.get(probe, {}))
+
+        self.REPORT.clear()
+        self.REPORT.update(ordered)
 
     @staticmethod
     def clean_name(value):
@@ -185,31 +334,36 @@ class ChainExecution:
         time_ = time.strftime('%H.%M.%S')
 
         try:
-            self.work_dir = os.path.join(
-                self.base_dir,
-                '{}_{}_{}_{}'.format(
-                    self.clean_name(self.REPORT.get('ro.product.manufacturer', self.REPORT['serial'])),
-                    self.clean_name(self.REPORT.get('ro.product.model', self.REPORT['permisson'])),
-                    date_,
-                    time_
-                )
-            )
+            parts = [
+                self.clean_name(self.REPORT.get('ro.product.manufacturer', self.REPORT['serial'])),
+                self.clean_name(self.REPORT.get('ro.product.model', self.REPORT['permisson'])),
+                date_,
+                time_
+            ]
+
+            if self.serial:
+                parts.insert(2, self.clean_name(self.serial))
+
+            self.work_dir = os.path.join(self.base_dir, '_'.join(parts))
         except Exception:
-            self.work_dir = os.path.join(self.base_dir, f'evildetective_extraction_{date_}_{time_}')
+            serial = f'{self.clean_name(self.serial)}_' if self.serial else ''
+
+            self.work_dir = os.path.join(self.base_dir, f'evildetective_extraction_{serial}{date_}_{time_}')
 
         self.output_dir = os.path.join(self.base_dir, self.work_dir, self.extract_dir)
         self.logger.debug(f'work_dir:{self.work_dir}')
         self.logger.debug(f'output_dir:{self.output_dir}')
         self.setup()
 
-    def download_file(self, file_path):
-        file_remote = self.adb.exists(file_path, su=self.su)
+    def download_file(self, file_path, remote_size=None):
+        file_remote = file_path if remote_size is not None else self.adb.exists(file_path, su=self.su)
 
         if file_remote:
             file_name = os.path.basename(file_remote)
             file_local = os.path.join(self.output_dir, file_name)
 
-            remote_size = self.adb.get_size(file_path, su=self.su)
+            if remote_size is None:
+                remote_size = self.adb.get_size(file_path, su=self.su)
 
             file_saveas = os.path.join(
                 os.path.split(file_local)[0],
@@ -224,35 +378,145 @@ class ChainExecution:
                 if os.path.exists(file_local):
                     self.DataStore.add(file_saveas, file_remote)
                     self.DOWNLOADS.append(file_name)
+                    self.add_manifest(file_remote)
 
                     return True
 
             elif self.permisson == self.ROOTSU:
-                for _ in range(100):
-                    file_obj = self.adb.get_file(file_path, su=self.su)
+                if remote_size > 0 and self.adb.fetch_file(file_remote, file_saveas, remote_size, su=self.su):
+                    self.DataStore.add(file_saveas, file_remote)
+                    self.DOWNLOADS.append(file_name)
+                    self.add_manifest(file_remote)
+
+                    return True
+
+                self.logger.warning(f'Failed getting file: {file_name}')
+
+        return False
+
+    def store_member(self, tar, member, file_remote):
+        if member.size != self.remote_stats[file_remote]['size']:
+            self.logger.debug(f'Changed during transfer: {file_remote}')
+
+            return False
+
+        file_name = os.path.basename(file_remote)
+        file_local = os.path.join(self.output_dir, file_name)
+
+        with tar.extractfile(member) as R, open(file_local, 'wb') as W:
+            shutil.copyfileobj(R, W)
+
+        if os.path.getsize(file_local) != member.size:
+            return False
+
+        info = copy.copy(member)
+        info.name = file_remote.lstrip('/')
+
+        with open(file_local, 'rb') as R:
+            self.DataStore.addfile(info, R)
+
+        self.DOWNLOADS.append(file_name)
+        self.add_manifest(file_remote)
+
+        return True
+
+    def bulk_download(self, remote_files):
+        pending = set(remote_files)
+
+        for batch in self.adb.cmd_batches(remote_files, lambda b: self.adb.tar_command(b, self.su)):
+            with self.adb.tar_stream(batch, su=self.su) as stream:
+                try:
+                    with tarfile.open(fileobj=stream, mode='r|') as tar:
+                        for member in tar:
+                            file_remote = f'/{member.name.lstrip("/")}'
+
+                            if not member.isfile() or file_remote not in pending:
+                                continue
+
+                            if self.store_member(tar, member, file_remote):
+                                pending.discard(file_remote)
+
+                except (tarfile.TarError, OSError) as e:
+                    self.logger.warning(f'Bulk transfer interrupted: {e}')
+
+        self.logger.info(f'Bulk transfer: {len(remote_files) - len(pending)} of {len(remote_files)} files')
 
-                    if file_obj:
-                        if len(file_obj) == remote_size:
-                            with open(file_saveas, 'wb') as W:
-                                W.write(file_obj)
+        return [f for f in remote_files if f in pending]
 
-                            self.DataStore.add(file_saveas, file_remote)
-                            self.DOWNLOADS.append(file_name)
+    def add_manifest(self, file_remote):
+        if file_remote in self.remote_stats:
+            self.manifest[file_remote] = self.remote_stats[file_remote]
 
-                            return True
+    def write_manifest(self):
+        data = {
+            'serial': self.REPORT.get('serial'),
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'files': self.manifest
+        }
 
-                        time.sleep(0.25)
+        with open(os.path.join(self.work_dir, self.MANIFEST), 'w') as W:
+            json.dump(data, W, indent=1)
 
-                        self.logger.debug(f'Trying again for {file_name} ({len(file_obj)} bytes)')
+    def read_manifest(self, case_dir):
+        with suppress(OSError, ValueError):
+            with open(os.path.join(case_dir, self.MANIFEST)) as R:
+                return json.load(R)
+
+        return {}
+
+    def find_previous_case(self):
+        cases = []
+
+        for entry in os.scandir(self.base_dir):
+            if not entry.is_dir() or os.path.samefile(entry.path, self.work_dir):
+                continue
+
+            if self.read_manifest(entry.path).get('serial') == self.REPORT.get('serial'):
+                cases.append((os.path.getmtime(os.path.join(entry.path, self.MANIFEST)), entry.path))
+
+        return max(cases)[1] if cases else None
+
+    def reuse_file(self, previous_store, member, file_remote):
+        file_name = os.path.basename(file_remote)
+        file_local = os.path.join(self.output_dir, file_name)
+
+        with previous_store.extractfile(member) as R, open(file_local, 'wb') as W:
+            shutil.copyfileobj(R, W)
+
+        self.DataStore.add(file_local, file_remote)
+        self.DOWNLOADS.append(file_name)
+        self.add_manifest(file_remote)
+
+    def reuse_previous(self, remote_files):
+        previous = self.previous or self.find_previous_case()
+        previous_store = os.path.join(previous or '', self.DATA_STORE)
+
+        if not previous or not os.path.isfile(previous_store):
+            self.logger.info('No previous acquisition found, pulling all files.')
+
+            return remote_files
+
+        files = self.read_manifest(previous).get('files', {})
+
+        pending = []
+
+        with tarfile.open(previous_store) as store:
+            members = {m.name: m for m in store.getmembers()}
+
+            for file_remote in remote_files:
+                member = members.get(file_remote.lstrip('/'))
+
+                if member and files.get(file_remote) == self.remote_stats[file_remote]:
+                    self.reuse_file(store, member, file_remote)
 
                 else:
-                    self.logger.warning(f'Failed getting file: {file_name}')
+                    pending.append(file_remote)
 
-        return False
+        self.logger.info(f'Reused {len(remote_files) - len(pending)} unchanged files from {previous}')
 
-    def do_backup(self, ALL=True, shared=False, backup_name='backup.ab'):
-        backup_file = os.path.join(self.work_dir, backup_name)
+        return pending
 
+    def start_backup(self, backup_file, ALL=True, shared=False):
         cmd = [
             'backup',
             '-shared' if shared else '',
@@ -267,6 +531,13 @@ class ChainExecution:
         if self.updater:
             messages.msg_do_backup()
 
+        return com
+
+    def do_backup(self, ALL=True, shared=False, backup_name='backup.ab'):
+        backup_file = os.path.join(self.work_dir, backup_name)
+
+        com = self.start_backup(backup_file, ALL=ALL, shared=shared)
+
         while com.is_alive():
             time.sleep(0.5)
 
@@ -277,9 +548,85 @@ class ChainExecution:
 
         self.backup = backup_file
 
-    def AndroidBackupToTar(self):
-        self.update('Unpacking backup...')
-        self.tarfile = self.tools.ab_to_tar(self.backup)
+    def stream_backup(self, ALL=True, shared=False, backup_name='backup.ab'):
+        backup_file = os.path.join(self.work_dir, backup_name)
+
+        com = self.start_backup(backup_file, ALL=ALL, shared=shared)
+
+        hasher = hashlib.md5()
+        last_update = 0
+
+        def progress(position):
+            nonlocal last_update
+
+            if time.monotonic() - last_update >= 0.5:
+                last_update = time.monotonic()
+
+                self.update(f'Reading backup: {utils.human_bytes(position)}', info=False)
+
+        raw = utils.FollowReader(backup_file, com.is_alive, hasher=hasher, progress=progress)
+        reader = io.BufferedReader(raw, self.inflate['buffer'])
+
+        self.backup = backup_file
+
+        extracted = False
+        downloads = len(self.DOWNLOADS)
+
+        try:
+            header = self.tools.ab_header(reader)
+
+            encrypted = header['encryption'] == self.tools.AB_ENCRYPTION
+
+            if encrypted and not self.password and self.updater:
+                self.password = messages.ask_backup_password()
+
+            if not encrypted or self.password:
+                self.ExtractFromBackup(targets=self.registry.get_all_links(), source=reader, header=header)
+
+                extracted = True
+
+        except utils.DetectiveError as e:
+            self.logger.warning(f'Backup not extracted while reading: {e}')
+
+        finally:
+            raw.finish()
+            com.join()
+            reader.close()
+
+        if len(self.DOWNLOADS) == downloads and not self.check_backup():
+            return
+
+        self.backup_extracted = extracted
+
+        with open(f'{backup_file}.md5', 'w') as W:
+            W.write(hasher.hexdigest())
+
+    def check_backup(self):
+        if self.backup and (not os.path.exists(self.backup) or os.path.getsize(self.backup) <= 2 ** 10):
+            self.logger.error('Android backup failed - too small.')
+
+            self.backup = False
+
+        return bool(self.backup)
+
+    def ExtractFromBackup(self, targets=[], source=None, header=None):
+        self.update('Extracting from backup...')
+
+        keep_tar = f'{self.backup}.tar' if self.keep_tar else None
+
+        for fn in self.tools.extract_form_ab(
+                source or self.backup,
+                self.output_dir,
+                targets=targets,
+                keep_tar=keep_tar,
+                password=self.password,
+                header=header,
+                **self.inflate
+            ):
+            self.DataStore.add(os.path.join(self.output_dir, fn), fn)
+            self.DOWNLOADS.append(fn)
+
+        self.tarfile = keep_tar
 
     def ExtractFromTar(self, targets=[]):
         self.update('Extracting from backup...')
@@ -346,26 +693,56 @@ class ChainExecution:
 
             self.update('Acquiring databases via root...')
 
-            for file_path in self.registry.get_root_links():
-                self.download_file(file_path)
+            links = self.registry.get_root_links()
 
-        elif run_backup or self.permisson == self.USER:
-            self.do_backup(shared=shared)
+            self.remote_stats = self.adb.probe_files(links, su=self.su)
+
+            if self.remote_stats is None:
+                self.remote_stats = {}
+
+                for file_path in links:
+                    self.download_file(file_path)
+
+            else:
+                pending = [f for f, stat in self.remote_stats.items() if stat['size']]
+
+                if self.incremental:
+                    self.update('Reusing unchanged files...')
+
+                    pending = self.reuse_previous(pending)
+
+                if self.bulk and pending and self.adb.can_stream:
+                    self.update('Streaming databases from device...')
+
+                    pending = self.bulk_download(pending)
 
-            if self.backup and os.path.getsize(self.backup) <= 2 ** 10:
-                self.logger.error('Android backup failed - too small.')
+                for file_remote in pending:
+                    self.download_file(file_remote, self.remote_stats[file_remote]['size'])
 
-                self.backup = False
+            self.write_manifest()
+
+        elif run_backup or self.permisson == self.USER:
+            if self.overlap:
+                self.stream_backup(shared=shared)
+            else:
+                self.do_backup(shared=shared)
+                self.check_backup()
 
     def DataExtraction(self):
         self.update('Extracting data from source...')
 
-        if self.backup:
-            self.AndroidBackupToTar()
+        if self.backup_extracted:
+            return
+
+        targets = self.registry.get_all_links()
 
-        if self.tarfile:
-            targets = self.registry.get_all_links()
+        if self.backup and not self.password and self.updater and self.tools.ab_is_encrypted(self.backup):
+            self.password = messages.ask_backup_password()
 
+        if self.backup:
+            self.ExtractFromBackup(targets=targets)
+
+        elif self.tarfile:
             self.ExtractFromTar(targets=targets)
 
     def DecodeShared(self):
@@ -373,7 +750,7 @@ class ChainExecution:
             if self.backup or (self.do_shared and self.backup):
                 self.update('Decoding shared filesystem...')
 
-                deco = decoders.SharedFilesystemDecoder(self.work_dir, self.backup)
+                deco = decoders.SharedFilesystemDecoder(self.work_dir, self.backup, password=self.password)
 
                 self.DECODED.append([deco.report_html(), f'{deco.title} ({len(deco.DATA)})'])
         except Exception as e:
@@ -385,25 +762,60 @@ class ChainExecution:
 
         workbook = self.get_master_workbook()
 
+        jobs = []
+
         for file_name in filter(None, self.DOWNLOADS):
-            if self.registry.has_target(file_name):
-                for deco_class in self.registry.decoders_target(file_name):
-                    file_path = os.path.join(self.output_dir, file_name)
+            if not self.registry.has_target(file_name):
+                continue
 
-                    try:
-                        self.logger.info(f'Decoding {file_name} using {deco_class.__name__}')
-                        
-                        deco = deco_class(self.work_dir, file_path)
+            deco_classes = self.registry.decoders_target(file_name)
 
-                        if not deco.template_name:
-                            continue
+            self.logger.info(f'Decoding {file_name} using {", ".join(d.__name__ for d in deco_classes)}')
 
-                        self.DECODED.append([deco.report_html(), f'{deco.title} ({len(deco.DATA)})'])
+            jobs.append((file_name, os.path.join(self.output_dir, file_name), deco_classes))
 
-                        deco.report_xlsx(workbook=workbook)
+        if self.workers > 1 and len(jobs) > 1:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers) as executor:
+                futures = [executor.submit(decode_file, self.work_dir, file_path, deco_classes, self.use_cache) for
+                           _, file_path, deco_classes in jobs]
+
+                for (file_name, file_path, _), future in zip(jobs, futures):
+                    try:
+                        results = future.result()
                     except Exception as e:
                         logger.error(f'Decoding error for `{os.path.basename(file_name)}`: {e}')
-                        logger.exception(str(e))
+
+                        continue
+
+                    self.report_decoded(workbook, file_name, file_path, results)
+
+        else:
+            for file_name, file_path, deco_classes in jobs:
+                results = decode_file(self.work_dir, file_path, deco_classes, self.use_cache)
+
+                self.report_decoded(workbook, file_name, file_path, results)
+
+    def report_decoded(self, workbook, file_name, file_path, results):
+        for deco_class, DATA, error in results:
+            if error:
+                logger.error(f'Decoding error for `{os.path.basename(file_name)}` using {deco_class.__name__}')
+                logger.error(error)
+
+                continue
+
+            if not deco_class.template_name:
+                continue
+
+            try:
+                deco = deco_class(self.work_dir, file_path, stage=True)
+                deco.DATA = DATA
+
+                self.DECODED.append([deco.report_html(), f'{deco.title} ({len(deco.DATA)})'])
+
+                deco.report_xlsx(workbook=workbook)
+            except Exception as e:
+                logger.error(f'Decoding error for `{os.path.basename(file_name)}`: {e}')
+                logger.exception(str(e))
 
     def GenerateHtmlReport(self, open_html=True):
         self.update('Generating HTML report...')
@@ -1,4 +1,8 @@
+import multiprocessing
 import windows
 
-root = windows.MainWindow()
-root.mainloop()
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+
+    root = windows.MainWindow()
+    root.mainloop()
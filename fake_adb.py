@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+import os
+import re
+import sys
+import time
+import zlib
+import shlex
+import shutil
+import tarfile
+import threading
+import subprocess
+import configparser
+from appdirs import AppDirs
+
+SERIAL = 'FAKEADB0001'
+
+SETTINGS = {
+    'root': ('FAKE_ADB_ROOT', 'fake_adb_root', ''),
+    'mode': ('FAKE_ADB_MODE', 'fake_adb_mode', 'root'),
+    'latency': ('FAKE_ADB_LATENCY', 'fake_adb_latency', '0'),
+    'bandwidth': ('FAKE_ADB_BANDWIDTH', 'fake_adb_bandwidth', '0'),
+    'serial': ('FAKE_ADB_SERIAL', 'fake_adb_serial', SERIAL)
+}
+
+PRELUDE = r'''
+id() {
+    if [ "$FAKE_ADB_UID" = 0 ]; then echo 'uid=0(root) gid=0(root) groups=0(root) context=u:r:su:s0';
+    else echo 'uid=2000(shell) gid=2000(shell) groups=2000(shell) context=u:r:shell:s0'; fi
+}
+su() {
+    [ "$FAKE_ADB_MODE" = user ] && { echo 'su: not found' >&2; return 127; }
+    [ "$1" = -c ] && shift
+    if [ $# -gt 0 ]; then FAKE_ADB_UID=0 sh -c "$*"; else FAKE_ADB_UID=0 sh; fi
+}
+dumpsys() { cat "$FAKE_ADB_ROOT/.dumpsys/$1" 2>/dev/null; }
+getprop() { sed -n "s/^$1=//p" "$FAKE_ADB_ROOT/system/build.prop" 2>/dev/null; }
+'''
+
+
+def settings():
+    conf = configparser.ConfigParser(allow_no_value=True, interpolation=None)
+    conf.read(os.path.join(AppDirs(appname='evildetective').user_config_dir, 'config.ini'))
+
+    return {
+        name: os.environ.get(env) or conf['DEFAULT'].get(key) or default
+        for name, (env, key, default) in SETTINGS.items()
+    }
+
+
+class Throttle:
+    def __init__(self, stream, bandwidth=0):
+        self.stream = stream
+        self.bandwidth = bandwidth
+        self.started = time.monotonic()
+        self.sent = 0
+
+    def write(self, data):
+        if self.bandwidth:
+            self.sent += len(data)
+
+            ahead = self.sent / self.bandwidth - (time.monotonic() - self.started)
+
+            if ahead > 0:
+                time.sleep(ahead)
+
+        self.stream.write(data)
+        self.stream.flush()
+
+        return len(data)
+
+    def flush(self):
+        self.stream.flush()
+
+
+class Unrewrite:
+    def __init__(self, stream, prefixes):
+        self.stream = stream
+        self.prefixes = sorted(prefixes, key=len, reverse=True)
+        self.keep = max(map(len, prefixes)) - 1
+        self.tail = b''
+
+    def write(self, data):
+        data = self.tail + data
+
+        for prefix in self.prefixes:
+            data = data.replace(prefix, b'')
+
+        cut = max(0, len(data) - self.keep)
+
+        self.tail = data[cut:]
+        self.stream.write(data[:cut])
+
+    def flush(self):
+        self.stream.write(self.tail)
+        self.stream.flush()
+
+        self.tail = b''
+
+
+class Compress:
+    def __init__(self, stream):
+        self.stream = stream
+        self.zlib_obj = zlib.compressobj(1)
+
+    def write(self, data):
+        self.stream.write(self.zlib_obj.compress(data))
+
+        return len(data)
+
+    def close(self):
+        self.stream.write(self.zlib_obj.flush())
+
+
+class FakeDevice:
+    DIRS = ['data', 'system', 'sdcard', 'storage', 'mnt', 'cache', 'vendor', 'efs']
+    PROTECTED = '/data/'
+    PUBLIC = ['/data/local/tmp']
+    DENIED = '/.denied'
+    AB_NAMESPACES = {'databases': 'db', 'files': 'f', 'shared_prefs': 'sp'}
+    AB_SKIP = ['cache', 'code_cache', 'no_backup', 'lib']
+    BLOCK = 2**16
+
+    def __init__(self, root, mode='root', latency=0, bandwidth=0, serial=SERIAL):
+        self.root = os.path.abspath(root)
+        self.mode = mode
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.serial = serial
+        self.uid = 0 if mode == 'root' else 2000
+        self.path_regex = re.compile(r'(?<![\w./-])/(?:' + '|'.join(self.DIRS) + r')(?:/[^\s\'"|;&<>()]*)?')
+
+    def local(self, path, uid=None):
+        uid = self.uid if uid is None else uid
+
+        if uid and path.startswith(self.PROTECTED) and not any(map(path.startswith, self.PUBLIC)):
+            return f'{self.root}{self.DENIED}{path}'
+
+        return f'{self.root}{path}'
+
+    def rewrite(self, cmd, uid=None):
+        return self.path_regex.sub(lambda m: self.local(m.group(0), uid), cmd)
+
+    def output(self, stream):
+        return Unrewrite(Throttle(stream, self.bandwidth), [f'{self.root}{self.DENIED}'.encode(), self.root.encode()])
+
+    def env(self, uid):
+        return {**os.environ, 'FAKE_ADB_ROOT': self.root, 'FAKE_ADB_MODE': self.mode, 'FAKE_ADB_UID': str(uid)}
+
+    def wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def devices(self):
+        print('List of devices attached')
+        print(f'{self.serial}\tdevice')
+
+        return 0
+
+    def shell(self, args):
+        if args and args[0] in ['-T', '-t', '-x']:
+            args = args[1:]
+
+        if args == ['su'] and self.mode == 'user':
+            sys.stderr.write('/system/bin/sh: su: not found\n')
+
+            return 127
+
+        if not args or args == ['su']:
+            return self.session(0 if args else self.uid)
+
+        return self.command(' '.join(args), self.uid)
+
+    def su_split(self, cmd):
+        try:
+            tokens = shlex.split(cmd)
+
+        except ValueError:
+            return None
+
+        if tokens[:2] == ['su', '-c']:
+            return ' '.join(tokens[2:])
+
+    def command(self, cmd, uid):
+        inner = self.su_split(cmd)
+
+        if inner is not None:
+            if self.mode == 'user':
+                sys.stderr.write('/system/bin/sh: su: not found\n')
+
+                return 127
+
+            return self.command(inner, 0)
+
+        with_tar = self.tar_paths(cmd)
+
+        if with_tar is not None:
+            return self.tar(with_tar, uid)
+
+        process = subprocess.Popen(
+            ['sh', '-c', f'{PRELUDE}\n{self.rewrite(cmd, uid)}'],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            env=self.env(uid)
+        )
+
+        self.pump(process.stdout, self.output(sys.stdout.buffer))
+
+        return process.wait()
+
+    def session(self, uid):
+        process = subprocess.Popen(
+            ['sh'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=self.env(uid)
+        )
+
+        process.stdin.write(PRELUDE.encode())
+        process.stdin.flush()
+
+        def feed():
+            pending = b''
+
+            for chunk in iter(lambda: os.read(sys.stdin.fileno(), self.BLOCK), b''):
+                self.wait()
+
+                lines, _, pending = (pending + chunk).rpartition(b'\n')
+
+                if lines:
+                    process.stdin.write(self.rewrite(lines.decode(errors='surrogateescape'), uid)
+                                        .encode(errors='surrogateescape') + b'\n')
+                    process.stdin.flush()
+
+            process.stdin.close()
+
+        threading.Thread(target=feed, daemon=True).start()
+
+        output = self.output(sys.stdout.buffer)
+
+        for chunk in iter(lambda: process.stdout.read1(self.BLOCK), b''):
+            output.write(chunk)
+            output.flush()
+
+        return process.wait()
+
+    def pump(self, stream, output):
+        for chunk in iter(lambda: stream.read1(self.BLOCK), b''):
+            output.write(chunk)
+
+        output.flush()
+
+    @staticmethod
+    def tar_paths(cmd):
+        try:
+            tokens = shlex.split(cmd)
+
+        except ValueError:
+            return None
+
+        if tokens[:3] == ['tar', '-cf', '-']:
+            return [t for t in tokens[3:] if not t.startswith('2>')]
+
+    def tar(self, paths, uid):
+        output = Throttle(sys.stdout.buffer, self.bandwidth)
+
+        with tarfile.open(fileobj=output, mode='w|') as tar:
+            for path in paths:
+                local = self.local(path, uid)
+
+                if os.path.exists(local):
+                    tar.add(local, arcname=path.lstrip('/'))
+
+                else:
+                    sys.stderr.write(f'tar: {path}: No such file or directory\n')
+
+        return 0
+
+    def pull(self, args):
+        args = [a for a in args if not a.startswith('-')]
+
+        if len(args) < 2:
+            sys.stderr.write('adb: usage: pull [-a] REMOTE... LOCAL\n')
+
+            return 1
+
+        *remotes, dst = args
+
+        for remote in remotes:
+            local = self.local(remote)
+
+            if not os.path.exists(local):
+                sys.stderr.write(f"adb: error: failed to stat remote object '{remote}': No such file or directory\n")
+
+                return 1
+
+            target = os.path.join(dst, os.path.basename(remote)) if os.path.isdir(dst) else dst
+
+            if os.path.isdir(local):
+                shutil.copytree(local, target, dirs_exist_ok=True)
+
+            else:
+                with open(local, 'rb') as R, open(target, 'wb') as W:
+                    throttle = Throttle(W, self.bandwidth)
+
+                    for d in iter(lambda: R.read(self.BLOCK), b''):
+                        throttle.write(d)
+
+            print(f'{remote}: 1 file pulled.')
+
+        return 0
+
+    def ab_name(self, pkg, rel):
+        ns, _, rest = rel.partition('/')
+
+        if ns in self.AB_SKIP:
+            return None
+
+        if ns in self.AB_NAMESPACES and rest:
+            return f'apps/{pkg}/{self.AB_NAMESPACES[ns]}/{rest}'
+
+        return f'apps/{pkg}/r/{rel}'
+
+    def ab_members(self, packages, ALL, shared):
+        apps_dir = self.local('/data/data', 0)
+
+        if os.path.isdir(apps_dir):
+            for pkg in sorted(os.listdir(apps_dir)):
+                if not (ALL or pkg in packages):
+                    continue
+
+                pkg_dir = os.path.join(apps_dir, pkg)
+
+                for base, _, files in os.walk(pkg_dir):
+                    for name in sorted(files):
+                        local = os.path.join(base, name)
+                        arcname = self.ab_name(pkg, os.path.relpath(local, pkg_dir).replace(os.sep, '/'))
+
+                        if arcname:
+                            yield local, arcname
+
+        shared_dir = self.local('/sdcard', 0)
+
+        if shared and os.path.isdir(shared_dir):
+            for base, _, files in os.walk(shared_dir):
+                for name in sorted(files):
+                    local = os.path.join(base, name)
+
+                    yield local, f'shared/0/{os.path.relpath(local, shared_dir).replace(os.sep, "/")}'
+
+    def backup(self, args):
+        args = [a for a in args if a]
+        backup_file = 'backup.ab'
+        packages = []
+        flags = set()
+
+        while args:
+            arg = args.pop(0)
+
+            if arg == '-f' and args:
+                backup_file = args.pop(0)
+
+            elif arg.startswith('-'):
+                flags.add(arg)
+
+            else:
+                packages.append(arg)
+
+        print('Now unlock your device and confirm the backup operation...')
+
+        with open(backup_file, 'wb') as W:
+            throttle = Throttle(W, self.bandwidth)
+            throttle.write(b'ANDROID BACKUP\n5\n1\nnone\n')
+
+            compress = Compress(throttle)
+
+            with tarfile.open(fileobj=compress, mode='w|') as tar:
+                for local, arcname in self.ab_members(packages, '-all' in flags, '-shared' in flags):
+                    tar.add(local, arcname=arcname)
+
+            compress.close()
+
+        return 0
+
+    def run(self, args):
+        if not args:
+            sys.stderr.write('adb: no command specified\n')
+
+            return 1
+
+        cmd, *args = args
+
+        if cmd == 'devices':
+            return self.devices()
+
+        if cmd in ['start-server', 'kill-server', 'wait-for-device', 'reboot']:
+            return 0
+
+        if cmd == 'version':
+            print('Android Debug Bridge version 1.0.41 (simulator)')
+
+            return 0
+
+        handlers = {
+            'exec-out': self.shell,
+            'shell': self.shell,
+            'pull': self.pull,
+            'backup': self.backup
+        }
+
+        if cmd not in handlers:
+            sys.stderr.write(f'adb: unknown command {cmd}\n')
+
+            return 1
+
+        self.wait()
+
+        return handlers[cmd](args)
+
+
+def main(argv=None):
+    args = list(sys.argv[1:] if argv is None else argv)
+    opts = settings()
+
+    if not opts['root'] or not os.path.isdir(opts['root']):
+        sys.stderr.write('adb: error: no devices/emulators found (fake_adb_root is not a directory)\n')
+
+        return 1
+
+    device = FakeDevice(
+        opts['root'],
+        mode=opts['mode'],
+        latency=float(opts['latency']) / 1000,
+        bandwidth=int(opts['bandwidth']),
+        serial=opts['serial']
+    )
+
+    if args[:1] == ['-s']:
+        if args[1:2] != [device.serial]:
+            sys.stderr.write(f"adb: device '{''.join(args[1:2])}' not found\n")
+
+            return 1
+
+        args = args[2:]
+
+    return device.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -208,6 +208,7 @@ class LockscreenBase(BaseWindow):
         self.STOP = tk.BooleanVar()
         self.stats_enabled = False
         self.prog_enabled = False
+        self.case_dir = None
         self.menubar = tk.Menu(self.root, tearoff=0)
         self.root['menu'] = self.menubar
 
@@ -258,6 +259,7 @@ class LockscreenBase(BaseWindow):
             if salt_value:
                 self.logger.info(f'Lockscreen salt: {salt_value}')
                 self.SALT.set(salt_value)
+                self.set_case_dir(dialog)
 
             else:
                 messagebox.showwarning(
@@ -280,6 +282,7 @@ class LockscreenBase(BaseWindow):
                 if salt_value:
                     self.logger.info(f'Lockscreen salt: {salt_value}')
                     self.SALT.set(salt_value)
+                    self.set_case_dir(dialog)
             except Exception:
                 messagebox.showwarning(
                     'Value not found',
@@ -298,6 +301,7 @@ class LockscreenBase(BaseWindow):
             if len(salt_values) == 1:
                 self.logger.info(f'Lockscreen salt: {salt_values[0]}')
                 self.SALT.set(salt_values[0])
+                self.set_case_dir(dialog)
 
             elif len(salt_values) > 1:
                 for n, s in enumerate(salt_values, start=1):
@@ -323,6 +327,7 @@ class LockscreenBase(BaseWindow):
 
                     self.logger.info(f'Password hash: {hash_val}')
                     self.HASH.set(hash_val)
+                    self.case_dir = os.path.dirname(file_)
         except FileHandlerError as err:
             messagebox.showwarning('Wrong file size', str(err))
         except UnicodeDecodeError:
@@ -330,6 +335,10 @@ class LockscreenBase(BaseWindow):
                 'Wrong file type', 'The file is binary, not suitable.'
             )
 
+    def set_case_dir(self, file_path):
+        if not self.case_dir:
+            self.case_dir = os.path.dirname(file_path)
+
     def enable_pin_range(self):
         self.start_label = ttk.Label(self.mainframe, text='Start from: ')
 
@@ -457,7 +466,9 @@ class LockscreenBase(BaseWindow):
             crack = cracking.PasswordCrack(
                 self.HASH.get(), self.SALT.get(),
                 start=self.START.get(), end=self.END.get(),
-                update_rate=int(self.conf('update_rate')), **kwargs
+                update_rate=int(self.conf('update_rate')),
+                workers=int(self.conf('crack_workers')),
+                checkpoint_dir=self.case_dir, **kwargs
             )
 
             result = crack.crack_password(
@@ -509,6 +520,7 @@ class BruteGenDict(LockscreenBase):
 
         self.enable_wordlist()
         self.enable_stats()
+        self.enable_progress()
 
     def start(self):
         dict_file = self.DICTFILE.get()
@@ -522,6 +534,7 @@ class BruteSamDict(LockscreenBase):
 
         self.enable_wordlist()
         self.enable_stats()
+        self.enable_progress()
 
     def start(self):
         dict_file = self.DICTFILE.get()
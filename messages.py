@@ -1,4 +1,4 @@
-from tkinter import messagebox
+from tkinter import messagebox, simpledialog
 
 content_protect = '** Content Protection Enabled! **\nIt is not possible to capture this type of content.'
 
@@ -46,6 +46,10 @@ def select_output():
     return messagebox.showwarning('Error!', 'Select the "Output" directory first!')
 
 
+def ask_backup_password():
+    return simpledialog.askstring('Encrypted backup', 'Enter the Android backup password:', show='*')
+
+
 def device_not_detected():
     return messagebox.showwarning(
         'Device not detected!',
@@ -0,0 +1,127 @@
+import argparse
+import logging
+import threading
+import traceback
+import concurrent.futures
+import adb_connection
+import detective
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceOrchestrator:
+    READY = 'device'
+
+    def __init__(self, base_dir, parallel=4, progress=None, **kwargs):
+        self.base_dir = base_dir
+        self.parallel = parallel
+        self.progress = progress
+        self.case_kwargs = kwargs
+        self.logger = kwargs.pop('logger', logger)
+        self.status = {}
+        self.lock = threading.Lock()
+
+    def devices(self):
+        adb = adb_connection.ADBConnection()
+
+        adb.start()
+
+        devices = adb.devices()
+
+        for serial, status in devices:
+            if status != self.READY:
+                self.logger.warning(f'Skipping {serial}: {status}')
+
+        return [serial for serial, status in devices if status == self.READY]
+
+    def update(self, serial, msg):
+        with self.lock:
+            self.status[serial] = msg
+
+        if self.progress:
+            self.progress(serial, msg)
+
+    def run_device(self, serial):
+        case = detective.ChainExecution(
+            self.base_dir,
+            use_adb=True,
+            serial=serial,
+            progress=lambda msg: self.update(serial, msg),
+            **self.case_kwargs
+        )
+
+        try:
+            case.InitialAdbRead()
+            case.CreateWorkDir()
+            case.DataAcquisition(
+                run_backup=self.case_kwargs.get('run_backup', False),
+                shared=self.case_kwargs.get('do_shared', False)
+            )
+            case.DataExtraction()
+            case.DecodeShared()
+            case.DataDecoding()
+            case.GenerateHtmlReport(open_html=False)
+            case.GenerateXlsxReport()
+            case.CleanUp()
+
+        finally:
+            case.adb.close_sessions()
+
+        return case.work_dir
+
+    def run(self, serials=None):
+        serials = serials or self.devices()
+        results = {}
+
+        self.logger.info(f'Acquiring {len(serials)} device(s), {self.parallel} at a time')
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.parallel) as executor:
+            futures = {executor.submit(self.run_device, serial): serial for serial in serials}
+
+            for future in concurrent.futures.as_completed(futures):
+                serial = futures[future]
+
+                try:
+                    results[serial] = future.result(), None
+
+                    self.update(serial, 'Finished.')
+
+                except Exception as e:
+                    results[serial] = None, ''.join(traceback.format_exception(type(e), e, e.__traceback__))
+
+                    self.update(serial, f'Failed: {e}')
+
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Acquire all attached Android devices concurrently')
+    parser.add_argument('output', help='directory where case folders are created')
+    parser.add_argument('--parallel', type=int, default=4, help='devices acquired at the same time')
+    parser.add_argument('--serial', nargs='+', help='only these serials (default: all attached devices)')
+    parser.add_argument('--backup', action='store_true', help='force the Android Backup method')
+    parser.add_argument('--shared', action='store_true', help='also acquire shared storage')
+    parser.add_argument('--incremental', action='store_true', help='reuse unchanged files from previous cases')
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+
+    orchestrator = DeviceOrchestrator(
+        args.output,
+        parallel=args.parallel,
+        progress=lambda serial, msg: logger.info(f'[{serial}] {msg}'),
+        run_backup=args.backup,
+        do_shared=args.shared,
+        incremental=args.incremental
+    )
+
+    for serial, (work_dir, error) in orchestrator.run(args.serial).items():
+        if error:
+            logger.error(f'[{serial}] {error}')
+        else:
+            logger.info(f'[{serial}] {work_dir}')
+
+
+if __name__ == '__main__':
+    main()
@@ -24,6 +24,71 @@ class Preferences(BaseWindow):
                 'control': tk.Spinbox,
                 'kwargs': {'from_': 1e4, 'to': 1e6, 'increment': 1e4}
             },
+            'crack_workers': {
+                'label': 'Cracking workers',
+                'tooltip': 'Number of processes searching the PIN/password keyspace in parallel.',
+                'var': tk.IntVar,
+                'control': tk.Spinbox,
+                'kwargs': {'from_': 1, 'to': 64, 'increment': 1}
+            },
+            'decode_workers': {
+                'label': 'Decoding workers',
+                'tooltip': 'Number of processes decoding extracted files in parallel (1 decodes serially).',
+                'var': tk.IntVar,
+                'control': tk.Spinbox,
+                'kwargs': {'from_': 1, 'to': 64, 'increment': 1}
+            },
+            'decode_cache_mb': {
+                'label': 'Decode cache (MB)',
+                'tooltip': 'Size limit of the cache of decoded results reused for unchanged files (0 disables it).',
+                'var': tk.IntVar,
+                'control': tk.Spinbox,
+                'kwargs': {'from_': 0, 'to': 1e5, 'increment': 128}
+            },
+            'keep_backup_tar': {
+                'label': 'Keep backup TAR',
+                'tooltip': 'Also write the unpacked .tar next to the .ab while streaming a backup.',
+                'var': tk.IntVar,
+                'control': ttk.Checkbutton
+            },
+            'overlap_backup': {
+                'label': 'Extract while backing up',
+                'tooltip': 'Hash, unpack and extract the Android backup while adb is still writing it.',
+                'var': tk.IntVar,
+                'control': ttk.Checkbutton
+            },
+            'adb_session': {
+                'label': 'Persistent ADB shell',
+                'tooltip': 'Run device commands through one long-lived adb shell instead of a new adb process each.',
+                'var': tk.IntVar,
+                'control': ttk.Checkbutton
+            },
+            'bulk_pull': {
+                'label': 'Bulk root pull',
+                'tooltip': 'Stream all root targets from the device as one tar instead of pulling them one by one.',
+                'var': tk.IntVar,
+                'control': ttk.Checkbutton
+            },
+            'probe_deadline': {
+                'label': 'Device probe deadline (s)',
+                'tooltip': 'Time allowed for reading device information, all probes running at once.',
+                'var': tk.IntVar,
+                'control': tk.Spinbox,
+                'kwargs': {'from_': 5, 'to': 300, 'increment': 5}
+            },
+            'permission_timeout': {
+                'label': 'Permission probe timeout (s)',
+                'tooltip': 'Time allowed for checking root and su access, including a pending su grant prompt.',
+                'var': tk.IntVar,
+                'control': tk.Spinbox,
+                'kwargs': {'from_': 10, 'to': 600, 'increment': 10}
+            },
+            'adb_path': {
+                'label': 'ADB binary',
+                'tooltip': 'Path to the adb executable, e.g. fake_adb.py to acquire from a simulated device (empty = auto).',
+                'var': tk.StringVar,
+                'control': ttk.Entry
+            },
             'offline_mode': {
                 'label': 'Offline mode',
                 'tooltip': 'Offline mode skips latest version checking on startup.',
@@ -1,17 +1,24 @@
+import io
 import hashlib
 import zlib
 import threading
+import queue
+import itertools
 import os
 import re
 import json
 import uuid
 import string
+import fnmatch
 import tarfile
 import tempfile
 import logging
 import functools
 import contextlib
 import datetime
+import time
+from Cryptodome.Cipher import AES
+from Cryptodome.Util.Padding import unpad
 
 logger = logging.getLogger(__name__)
 
@@ -55,6 +62,127 @@ def human_bytes(size):
             return f'{round(size / (2 ** (pw - 10)), pw // 20)}{name}'
 
 
+def batched(iterable, size):
+    it = iter(iterable)
+
+    while True:
+        batch = list(itertools.islice(it, size))
+
+        if not batch:
+            return
+
+        yield batch
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+_DONE = object()
+
+
+def pipeline(source, *stages, depth=8):
+    stages = iter, *stages
+    stop = threading.Event()
+    queues = [queue.Queue(depth) for _ in stages]
+
+    def put(q, item):
+        while not stop.is_set():
+            with contextlib.suppress(queue.Full):
+                q.put(item, timeout=0.1)
+
+                return True
+
+        return False
+
+    def drain(q):
+        while True:
+            item = q.get()
+
+            if item is _DONE:
+                return
+
+            if isinstance(item, _Failure):
+                raise item.error
+
+            yield item
+
+    def run(stage, items, q):
+        try:
+            for item in stage(items):
+                if not put(q, item):
+                    return
+
+        except BaseException as e:
+            put(q, _Failure(e))
+
+        put(q, _DONE)
+
+    items = source
+
+    for stage, q in zip(stages, queues):
+        threading.Thread(target=run, args=(stage, items, q), daemon=True).start()
+
+        items = drain(q)
+
+    try:
+        yield from items
+    finally:
+        stop.set()
+
+
+def read_blocks(file_obj, buffer=2**20):
+    return iter(lambda: file_obj.read(buffer), b'')
+
+
+def inflate_blocks(blocks):
+    zlib_obj = zlib.decompressobj()
+
+    for d in blocks:
+        c = zlib_obj.decompress(d)
+
+        if c:
+            yield c
+
+    c = zlib_obj.flush()
+
+    if c:
+        yield c
+
+
+def decrypt_blocks(key, iv):
+    def decrypt(blocks):
+        cipher = AES.new(key, AES.MODE_CBC, iv)
+
+        tail = b''
+
+        for d in blocks:
+            d = memoryview(d)
+
+            fill = AES.block_size - len(tail) if len(tail) < AES.block_size else 0
+
+            tail += d[:fill]
+            d = d[fill:]
+
+            if not d:
+                continue
+
+            size = len(d) - (len(d) % AES.block_size or AES.block_size)
+
+            yield cipher.decrypt(tail)
+
+            if size:
+                yield cipher.decrypt(d[:size])
+
+            tail = bytes(d[size:])
+
+        if tail:
+            yield unpad(cipher.decrypt(tail), AES.block_size)
+
+    return decrypt
+
+
 def totupe(ver):
     res = re.match(r'^(?:\d\.?)+', ver.strip()).group()
 
@@ -126,66 +254,286 @@ def hash_file(file_path, algo='md5', buff=2**20):
     return hasher.hexdigest()
 
 
+class TargetMatcher:
+    GLOB = re.compile(r'[*?\[]')
+
+    def __init__(self, targets=None):
+        self.exact = set()
+
+        patterns = []
+
+        for target in targets or []:
+            if self.GLOB.search(target):
+                patterns.append(fnmatch.translate(target))
+            else:
+                self.exact.add(target)
+
+        self.rex = re.compile('|'.join(patterns)) if patterns else None
+
+    def __call__(self, name):
+        return name in self.exact or bool(self.rex and self.rex.match(name))
+
+
+class ChunkReader(io.RawIOBase):
+    def __init__(self, chunks, tee=None):
+        self.chunks = iter(chunks)
+        self.tee = tee
+        self.pending = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self.pending:
+            self.pending = next(self.chunks, b'')
+
+            if not self.pending:
+                break
+
+            if self.tee:
+                self.tee.write(self.pending)
+
+        size = min(len(b), len(self.pending))
+
+        b[:size] = self.pending[:size]
+
+        self.pending = self.pending[size:]
+
+        return size
+
+
+class FollowReader(io.RawIOBase):
+    def __init__(self, file_path, alive, hasher=None, progress=None, poll=0.2):
+        self.file_path = file_path
+        self.alive = alive
+        self.hasher = hasher
+        self.progress = progress
+        self.poll = poll
+        self.file_obj = None
+        self.position = 0
+        self.lock = threading.Lock()
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        with self.lock:
+            while True:
+                running = self.alive()
+
+                if self.file_obj is None and os.path.exists(self.file_path):
+                    self.file_obj = open(self.file_path, 'rb', buffering=0)
+
+                size = self.file_obj.readinto(b) if self.file_obj else 0
+
+                if size:
+                    self.position += size
+
+                    if self.hasher:
+                        self.hasher.update(memoryview(b)[:size])
+
+                    if self.progress:
+                        self.progress(self.position)
+
+                    return size
+
+                if not running:
+                    return 0
+
+                time.sleep(self.poll)
+
+    def finish(self, buffer=2**20):
+        buff = bytearray(buffer)
+
+        while self.readinto(buff):
+            pass
+
+    def close(self):
+        if self.file_obj:
+            self.file_obj.close()
+
+        super().close()
+
+
 class DetectiveTools:
     AB_MAGIC = b'ANDROID BACKUP'
 
+    AB_ENCRYPTION = 'AES-256'
+
     @classmethod
-    def ab_file_verify(cls, file_obj):
+    def ab_header(cls, file_obj):
         if file_obj.read(len(cls.AB_MAGIC)) != cls.AB_MAGIC:
             raise DetectiveError('Not an Android backup file!')
 
-        type_ = file_obj.read(4)
+        def line():
+            return file_obj.readline().strip().decode()
+
+        line()
+
+        header = {
+            'version': int(line()),
+            'compressed': line() == '1',
+            'encryption': line()
+        }
+
+        if header['encryption'] == cls.AB_ENCRYPTION:
+            header['user_salt'] = bytes.fromhex(line())
+            header['checksum_salt'] = bytes.fromhex(line())
+            header['rounds'] = int(line())
+            header['user_iv'] = bytes.fromhex(line())
+            header['master_blob'] = bytes.fromhex(line())
 
-        if type_ == b'AES-':
+        elif header['encryption'] != 'none':
+            raise DetectiveError(f'Unsupported AB encryption: {header["encryption"]}')
+
+        return header
+
+    @classmethod
+    def ab_file_verify(cls, file_obj, password=None):
+        header = cls.ab_header(file_obj)
+
+        if header['encryption'] == cls.AB_ENCRYPTION and not password:
             raise DetectiveError('AB file is encrypted.')
 
-        elif type_ == b'none':
-            pass
+        return header
 
     @classmethod
-    def ab_to_tar(cls, input_file, to_tmp=False, buffer=2**20):
-        with open(input_file, 'rb') as backup_file:
-            cls.ab_file_verify(backup_file)
+    def ab_is_encrypted(cls, input_file):
+        with open(input_file, 'rb') as R:
+            return cls.ab_header(R)['encryption'] == cls.AB_ENCRYPTION
+
+    @staticmethod
+    def mangle_key(key):
+        return ''.join(chr(b if b < 0x80 else 0xFF00 | b) for b in key).encode()
+
+    @classmethod
+    def ab_master_key(cls, header, password):
+        rounds = header['rounds']
+
+        user_key = hashlib.pbkdf2_hmac('sha1', password.encode(), header['user_salt'], rounds, 32)
+
+        try:
+            cipher = AES.new(user_key, AES.MODE_CBC, header['user_iv'])
+
+            blob = unpad(cipher.decrypt(header['master_blob']), AES.block_size)
+
+            fields = []
+
+            while blob and len(fields) < 3:
+                size = blob[0]
+
+                fields.append(blob[1:1 + size])
+
+                blob = blob[1 + size:]
 
-            backup_file.seek(24)
+            iv, key, checksum = fields
+
+        except ValueError:
+            raise DetectiveError('Wrong backup password.')
+
+        key_bytes = cls.mangle_key(key) if header['version'] > 1 else key
+
+        if hashlib.pbkdf2_hmac('sha1', key_bytes, header['checksum_salt'], rounds, 32) != checksum:
+            raise DetectiveError('Wrong backup password.')
+
+        return key, iv
+
+    @classmethod
+    def ab_blocks(cls, backup_file, buffer=2**20, depth=8, password=None, header=None):
+        header = header or cls.ab_file_verify(backup_file, password)
+
+        stages = []
+
+        if header['encryption'] == cls.AB_ENCRYPTION:
+            stages.append(decrypt_blocks(*cls.ab_master_key(header, password)))
+
+        if header['compressed']:
+            stages.append(inflate_blocks)
+
+        return pipeline(read_blocks(backup_file, buffer), *stages, depth=depth)
+
+    @classmethod
+    def ab_to_tar(cls, input_file, to_tmp=False, buffer=2**20, depth=8, password=None):
+        with open(input_file, 'rb') as backup_file:
+            blocks = cls.ab_blocks(backup_file, buffer, depth, password)
 
             temptar = tempfile.NamedTemporaryFile(delete=False, suffix='.tar') if \
                 to_tmp else open(f'{input_file}.tar', 'wb')
 
-            zlib_obj = zlib.decompressobj()
+            with temptar:
+                for c in blocks:
+                    temptar.write(c)
 
-            while True:
-                d = backup_file.read(buffer)
+            return temptar.name
 
-                if not d:
-                    break
+    @classmethod
+    def stream_ab_members(cls, input_file, dst_dir, select, keep_tar=None, buffer=2**20, depth=8, password=None,
+                          header=None):
+        with contextlib.ExitStack() as stack:
+            backup_file = input_file if hasattr(input_file, 'read') else stack.enter_context(open(input_file, 'rb'))
 
-                c = zlib_obj.decompress(d)
+            blocks = stack.enter_context(
+                contextlib.closing(cls.ab_blocks(backup_file, buffer, depth, password, header))
+            )
 
-                temptar.write(c)
+            tee = stack.enter_context(open(keep_tar, 'wb')) if keep_tar else None
 
-            zlib_obj.flush()
+            reader = io.BufferedReader(ChunkReader(blocks, tee=tee), buffer)
 
-            temptar.close()
+            with tarfile.open(fileobj=reader, mode='r|') as tar:
+                for mem in tar:
+                    if not select(mem):
+                        continue
 
-            return temptar.name
+                    try:
+                        tar.extract(mem, dst_dir)
+
+                        yield mem
+                    except Exception as e:
+                        logger.warning(f'Failed extracting: {mem.name} > {e}')
+
+            if tee:
+                while reader.read(buffer):
+                    pass
+
+    @classmethod
+    def extract_form_ab(cls, input_file, dst_dir, targets=None, full=False, keep_tar=None, **kwargs):
+        matcher = TargetMatcher(targets)
+
+        def select(mem):
+            return full or matcher(mem.name)
+
+        for mem in cls.stream_ab_members(input_file, dst_dir, select, keep_tar=keep_tar, **kwargs):
+            logger.debug(mem.name)
+
+            yield mem.name
+
+    @classmethod
+    def extract_ab_members(cls, input_file, dst_dir, match='.+?', keep_tar=None, **kwargs):
+        rex = re.compile(match)
+
+        def select(mem):
+            return rex.match(mem.path)
+
+        yield from cls.stream_ab_members(input_file, dst_dir, select, keep_tar=keep_tar, **kwargs)
 
     @staticmethod
     def extract_form_tar(src_file, dst_dir, targets=None, full=False):
-        if targets is None:
-            targets = []
+        matcher = TargetMatcher(targets)
 
         with tarfile.open(src_file) as tar:
-            for tar_name in tar.getnames():
+            for mem in tar:
+                if not (full or matcher(mem.name)):
+                    continue
+
                 try:
-                    tar.extract(tar_name, dst_dir)
+                    tar.extract(mem, dst_dir)
 
-                    logger.debug(tar_name)
+                    logger.debug(mem.name)
 
-                    if tar_name in targets or full:
-                        yield tar_name
+                    yield mem.name
                 except Exception as e:
-                    logger.warning(f'Failed extracting: {tar_name} > {e}')
+                    logger.warning(f'Failed extracting: {mem.name} > {e}')
 
     @staticmethod
     def extract_tar_members(src_file, dst_dir, match='.+?'):
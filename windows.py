@@ -121,6 +121,12 @@ class MainWindow(BaseWindow):
 
         createToolTip(self.extract_shared_button, 'File system extraction of shared storage\n(Pictutes, Videos, Audios, other files)')
 
+        self.incremental = tk.IntVar()
+        self.incremental_button = ttk.Checkbutton(extract_adb_frame, text='Incremental (root)', var=self.incremental)
+        self.incremental_button.grid(row=6, column=0, columnspan=2, sticky=tk.W)
+
+        createToolTip(self.incremental_button, 'Only pull files changed since the previous extraction of this device')
+
         extract_folder_frame = ttk.Frame(noteframe, padding=(5, 0))
 
         noteframe.add(extract_folder_frame, text='Parse (Folder)')
@@ -317,15 +323,22 @@ class MainWindow(BaseWindow):
         menu_tools.add_separator()
         menu_tools.add_command(label='Screen Capture', command=self.screen_capture)
 
+    @staticmethod
+    def get_ab_password(ab_file):
+        if DetectiveTools.ab_is_encrypted(ab_file):
+            return messages.ask_backup_password()
+
     @threaded
     def ab_to_tar(self):
         ab_file = self.get_file('', ftype=[('AB File', '*.ab')])
 
         if ab_file:
+            password = self.get_ab_password(ab_file)
+
             self.logger.info(f'Converting {ab_file}')
             self.StatusMsg.set('Converting to tar...')
 
-            tar_ = DetectiveTools.ab_to_tar(ab_file, to_tmp=False)
+            tar_ = DetectiveTools.ab_to_tar(ab_file, to_tmp=False, password=password)
 
             self.logger.info(f'Converted to: {tar_}')
             self.StatusMsg.set('Finished')
@@ -335,17 +348,15 @@ class MainWindow(BaseWindow):
         ab_file = self.get_file('', ftype=[('AB File', '*.ab')])
 
         if ab_file:
-            self.logger.info(f'Converting {ab_file}')
-            self.StatusMsg.set('Converting to tar...')
-
-            tar_ = DetectiveTools.ab_to_tar(ab_file, to_tmp=False)
+            password = self.get_ab_password(ab_file)
 
-            self.StatusMsg.set('Extracting tar members...')
+            self.logger.info(f'Converting {ab_file}')
+            self.StatusMsg.set('Extracting backup members...')
 
             dst_ = pathlib.Path(f'{ab_file}_extracted/')
             dst_.mkdir()
 
-            for _ in DetectiveTools.extract_form_tar(tar_, dst_, full=True):
+            for _ in DetectiveTools.extract_form_ab(ab_file, dst_, full=True, password=password):
                 pass
 
             self.logger.info(f'Extracted to: {dst_}')
@@ -418,7 +429,16 @@ class MainWindow(BaseWindow):
 
             work_dir = self.OUTPUT.get() or os.path.split(file_path)[0]
 
-            dec = decoder.__class__(work_dir, file_path)
+            (deco_class, DATA, error), = detective.decode_file(work_dir, file_path, [decoder.__class__])
+
+            if error:
+                self.logger.error(error)
+
+                return
+
+            dec = deco_class(work_dir, file_path, stage=True)
+            dec.DATA = DATA
+
             html_rep = dec.report_html()
             report = work_dir / pathlib.Path(html_rep)
             webbrowser.open_new_tab(report.as_uri())
@@ -444,6 +464,7 @@ class MainWindow(BaseWindow):
                     output_dir,
                     status_msg=self.StatusMsg,
                     do_shared=self.extract_shared.get(),
+                    incremental=self.incremental.get(),
                     use_adb=True,
                     logger=self.logger
                 )